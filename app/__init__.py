@@ -2,7 +2,18 @@ import os
 import shutil
 from flask import Flask
 from .config import Config
-from .utils_csv import ensure_json_file, read_json, write_json
+from .utils_csv import ensure_json_file, read_json, write_json, update_json, configure_json_cache, file_lock, enable_journal
+from .timestamps import backfill_created_ts
+from .search import parse_tags
+from .current_user import CurrentUserCache
+from .cache import post_card
+from .lru import LRUCache
+from .news import NewsAggregator, configured_providers
+from .http_client import HttpClient
+from .geocoding import create_geocoder
+from .spatial import PointIndexCache
+from .point_import import PointImporter
+from .waste_catalog import WasteCatalogCache
 
 def migrate_uploads(app: Flask):
     """
@@ -25,6 +36,12 @@ def migrate_uploads(app: Flask):
         uid = u.get('id')
         if not uid:
             continue
+        # Caminhos antigos gravados no Windows usam '\\'; os templates esperam '/'
+        for key in ('profile_image', 'cover_image'):
+            if u.get(key) and '\\' in u[key]:
+                u[key] = u[key].replace('\\', '/')
+                users_changed = True
+
         base_rel = f"uploads/{uid}"
         base_dir = os.path.join(app.static_folder, base_rel.replace('/', os.sep))
         os.makedirs(os.path.join(base_dir, 'profile'), exist_ok=True)
@@ -69,6 +86,9 @@ def migrate_uploads(app: Flask):
     posts = read_json(posts_json)
     posts_changed = False
     for p in posts:
+        if p.get('image_path') and '\\' in p['image_path']:
+            p['image_path'] = p['image_path'].replace('\\', '/')
+            posts_changed = True
         ip = p.get('image_path')
         if ip and ip.startswith('uploads/post/'):
             fn = os.path.basename(ip)
@@ -101,6 +121,28 @@ def migrate_uploads(app: Flask):
         # não interrompe startup caso limpeza falhe
         pass
 
+def migrate_timestamps(app: Flask):
+    """
+    Preenche `created_ts` (chave numérica de ordenação) em posts e comentários
+    gravados antes de o campo existir. Só regrava o arquivo se faltar em algum.
+    """
+    for key in ('POSTS_JSON', 'COMMENTS_JSON'):
+        path = app.config[key]
+        ensure_json_file(path)
+        if any('created_ts' not in r for r in read_json(path, copy=False)):
+            update_json(path, lambda records: records if backfill_created_ts(records) else None)
+
+def migrate_tags(app: Flask):
+    """Grava `tag_list` (tags normalizadas, ver app.search.parse_tags) nos posts antigos."""
+    path = app.config['POSTS_JSON']
+    ensure_json_file(path)
+    if any('tag_list' not in p for p in read_json(path, copy=False)):
+        def _fill(posts):
+            for p in posts:
+                p.setdefault('tag_list', parse_tags(p.get('tags')))
+            return posts
+        update_json(path, _fill)
+
 def create_app():
     """
     Cria e configura a instância da aplicação Flask.
@@ -113,6 +155,11 @@ def create_app():
     """
     app = Flask(__name__, template_folder="templates", static_folder="static")
     app.config.from_object(Config)
+    configure_json_cache(app.config['JSON_CACHE_MAX_ENTRIES'])
+    if app.config['JSON_JOURNAL']:
+        enable_journal(app.config['USERS_JSON'], app.config['JOURNAL_MAX_BYTES'])
+        enable_journal(app.config['POSTS_JSON'], app.config['JOURNAL_MAX_BYTES'])
+        enable_journal(app.config['COMMENTS_JSON'], app.config['JOURNAL_MAX_BYTES'])
 
     # ensure folders
     # Garante que os diretórios necessários existam
@@ -120,7 +167,38 @@ def create_app():
     os.makedirs(app.config['DATA_FOLDER'], exist_ok=True)
 
     # migra estrutura de uploads se necessário
-    migrate_uploads(app)
+    # (sob lock: vários workers do gunicorn sobem ao mesmo tempo)
+    with file_lock(app.config['USERS_JSON']), file_lock(app.config['POSTS_JSON']):
+        migrate_uploads(app)
+    migrate_timestamps(app)
+    migrate_tags(app)
+
+    # camada de dados (backend escolhido em Config.STORAGE_BACKEND)
+    from .storage import create_store
+    store = create_store(app.config)
+    store.ensure()
+    store.likes.ensure(store.posts)
+    app.extensions['store'] = store
+    app.extensions['current_user_cache'] = CurrentUserCache(app.config['CURRENT_USER_CACHE_SIZE'])
+    app.extensions['page_cache'] = LRUCache(app.config['PAGE_CACHE_SIZE'])
+    app.extensions['fragment_cache'] = LRUCache(app.config['FRAGMENT_CACHE_SIZE'])
+    app.jinja_env.globals['post_card'] = post_card
+    app.extensions['http'] = http = HttpClient(timeout=app.config['HTTP_TIMEOUT'], retries=app.config['HTTP_RETRIES'],
+                                               failure_threshold=app.config['HTTP_BREAKER_FAILURES'],
+                                               reset_timeout=app.config['HTTP_BREAKER_RESET'],
+                                               user_agent=app.config['HTTP_USER_AGENT'])
+    app.extensions['geocoder'] = create_geocoder(app.config, http)
+    app.extensions['point_index'] = PointIndexCache(app.config['SPATIAL_CELL_DEG'])
+    app.extensions['waste_catalog'] = WasteCatalogCache(app.extensions['point_index'])
+    app.extensions['point_import'] = PointImporter(store, app.extensions['geocoder'], app.config['POINT_IMPORTS_JSON'],
+                                                   batch_size=app.config['POINT_IMPORT_BATCH_SIZE'])
+    app.extensions['news'] = NewsAggregator(configured_providers(app.config, http), ttl=app.config['NEWS_CACHE_TTL'],
+                                            max_stale=app.config['NEWS_MAX_STALE'],
+                                            timeout=app.config['NEWS_TIMEOUT'],
+                                            max_inflight=app.config['NEWS_MAX_INFLIGHT'])
+
+    from .cli import register_commands
+    register_commands(app)
 
     # register blueprints
     # Importa e registra os módulos (Blueprints)
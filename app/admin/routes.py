@@ -1,8 +1,10 @@
-from flask import request, current_app, redirect, url_for, flash, session, render_template
-from ..utils_csv import read_json, write_json, append_json, ensure_json_file
-from ..auth.routes import add_ban, get_all_bans, remove_ban
+from flask import request, current_app, redirect, url_for, flash, session, render_template, jsonify
+from ..storage import get_store
+from ..auth.routes import add_bans, get_all_bans, remove_bans
+from ..cache import cache_stats
 import datetime
-from geopy.geocoders import Nominatim
+from ..geocoding import geocode
+from ..point_import import PointImportError
 from . import bp
 
 # bp = Blueprint('admin', __name__)
@@ -14,16 +16,10 @@ def admin_required():
     """
     return session.get('is_admin', False)
 
-@bp.before_request
-def ensure_files():
-    """
-    Executado antes de cada requisição neste Blueprint.
-    Garante que os arquivos JSON necessários existam.
-    """
-    ensure_json_file(current_app.config['POSTS_JSON'])
-    ensure_json_file(current_app.config['COMMENTS_JSON'])
-    ensure_json_file(current_app.config['TAGS_JSON'])
-    ensure_json_file(current_app.config['COLLECTION_POINTS_JSON'])
+def _form_emails():
+    """Emails enviados no formulário (um ou vários campos `email`), normalizados e sem repetição."""
+    emails = (e.strip().lower() for e in request.form.getlist('email'))
+    return list(dict.fromkeys(e for e in emails if e))
 
 @bp.route('/')
 def dashboard():
@@ -38,10 +34,11 @@ def dashboard():
         flash('Acesso negado', 'error')
         return redirect(url_for('main.index'))
     
-    users = read_json(current_app.config['USERS_JSON'])
-    all_tags = read_json(current_app.config['TAGS_JSON'])
+    store = get_store()
+    users = store.users.all()
+    all_tags = store.tags.all()
     banned_users = get_all_bans()
-    collection_points = read_json(current_app.config['COLLECTION_POINTS_JSON'])
+    collection_points = store.points.all()
     
     # Organizar tags por usuário para facilitar no template
     user_tags = {}
@@ -77,15 +74,15 @@ def add_collection_point():
     
     address_str = f"{street}, {number} - {neighborhood}"
     lat, lon = 0.0, 0.0
+    precision = None
     
     try:
-        geolocator = Nominatim(user_agent="projeto_pweb_waste_app")
-        # Tenta geocodificar o endereço completo. 
-        # Adicionando "João Pessoa, PB, Brasil" para melhorar a precisão se for local
-        location = geolocator.geocode(f"{address_str}, João Pessoa, PB, Brasil")
+        # Tenta geocodificar o endereço completo (geocode acrescenta a cidade)
+        location = geocode(address_str)
         if location:
-            lat = location.latitude
-            lon = location.longitude
+            lat = location['lat']
+            lon = location['lon']
+            precision = location.get('precision')
     except Exception as e:
         print(f"Erro ao geocodificar: {e}")
 
@@ -97,11 +94,55 @@ def add_collection_point():
         'lat': lat,
         'lon': lon
     }
+    if precision:
+        # 'approximate': centro do bairro/logradouro (endereço não encontrado)
+        point['precision'] = precision
     
-    append_json(current_app.config['COLLECTION_POINTS_JSON'], point)
-    flash('Ponto de coleta adicionado', 'success')
+    get_store().points.add(point)
+    if precision == 'approximate':
+        flash('Ponto de coleta adicionado com localização aproximada (centro do bairro)', 'success')
+    else:
+        flash('Ponto de coleta adicionado', 'success')
     return redirect(url_for('admin.dashboard'))
 
+@bp.route('/collection-point/import', methods=['POST'])
+def import_collection_points():
+    """
+    Importação em lote de pontos de coleta (arquivo .csv ou .geojson).
+    - O arquivo é lido e validado na hora (linhas inválidas e repetidas são contadas).
+    - Endereços sem coordenadas são geocodificados em segundo plano e os
+      pontos novos gravados de uma vez (ver app.point_import).
+    - Redireciona para o painel, que acompanha o andamento pela rota de status.
+    """
+    if not admin_required():
+        flash('Acesso negado', 'error')
+        return redirect(url_for('main.index'))
+
+    upload = request.files.get('file')
+    if not upload or not upload.filename:
+        flash('Selecione um arquivo .csv ou .geojson', 'error')
+        return redirect(url_for('admin.dashboard'))
+
+    try:
+        job = current_app.extensions['point_import'].start(upload.stream, upload.filename)
+    except (PointImportError, UnicodeDecodeError) as e:
+        flash(f'Não foi possível importar o arquivo: {e}', 'error')
+        return redirect(url_for('admin.dashboard'))
+
+    flash(f'Importação iniciada: {len(job.points)} ponto(s) novo(s), '
+          f'{job.duplicates} repetido(s), {job.invalid} linha(s) inválida(s)', 'success')
+    return redirect(url_for('admin.dashboard', import_job=job.id))
+
+@bp.route('/collection-point/import/<job_id>')
+def import_collection_points_status(job_id):
+    """Andamento de uma importação em lote (JSON)."""
+    if not admin_required():
+        return jsonify({'error': 'Acesso negado'}), 403
+    progress = current_app.extensions['point_import'].status(job_id)
+    if progress is None:
+        return jsonify({'error': 'Importação não encontrada'}), 404
+    return jsonify(progress)
+
 @bp.route('/collection-point/delete', methods=['POST'])
 def delete_collection_point():
     if not admin_required():
@@ -109,9 +150,7 @@ def delete_collection_point():
         return redirect(url_for('main.index'))
         
     point_id = request.form.get('point_id')
-    points = read_json(current_app.config['COLLECTION_POINTS_JSON'])
-    points = [p for p in points if p['id'] != point_id]
-    write_json(current_app.config['COLLECTION_POINTS_JSON'], points)
+    get_store().points.delete(point_id)
     
     flash('Ponto de coleta removido', 'success')
     return redirect(url_for('admin.dashboard'))
@@ -131,7 +170,7 @@ def give_tag():
     brasilia_tz = datetime.timezone(datetime.timedelta(hours=-3))
     if not user_id or not tag:
         flash('Dados inválidos', 'error'); return redirect(url_for('main.index'))
-    append_json(current_app.config['TAGS_JSON'], {
+    get_store().tags.add({
         'user_id': user_id,
         'tag': tag,
         'given_by': session['user_id'],
@@ -145,14 +184,12 @@ def delete_post():
     """
     Rota para excluir uma postagem.
     - Verifica permissão de admin.
-    - Remove a postagem do arquivo posts.json pelo ID.
+    - Remove a postagem pelo ID, com seus comentários e curtidas.
     """
     if not admin_required():
         flash('Somente admins', 'error'); return redirect(url_for('main.index'))
     post_id = request.form.get('post_id')
-    posts = read_json(current_app.config['POSTS_JSON'])
-    posts = [p for p in posts if p['id'] != post_id]
-    write_json(current_app.config['POSTS_JSON'], posts)
+    get_store().delete_post(post_id)
     flash('Post apagado', 'success')
     return redirect(url_for('posts.list_posts'))
 
@@ -166,9 +203,7 @@ def delete_comment():
     if not admin_required():
         flash('Somente admins', 'error'); return redirect(url_for('main.index'))
     comment_id = request.form.get('comment_id')
-    comments = read_json(current_app.config['COMMENTS_JSON'])
-    comments = [c for c in comments if c['id'] != comment_id]
-    write_json(current_app.config['COMMENTS_JSON'], comments)
+    get_store().comments.delete(comment_id)
     flash('Comentário removido', 'success')
     return redirect(url_for('main.index'))
 
@@ -183,9 +218,7 @@ def remove_tag():
         flash('Somente admins', 'error'); return redirect(url_for('main.index'))
     user_id = request.form.get('user_id')
     tag = request.form.get('tag')
-    tags = read_json(current_app.config['TAGS_JSON'])
-    tags = [t for t in tags if not (t.get('user_id')==user_id and t.get('tag')==tag)]
-    write_json(current_app.config['TAGS_JSON'], tags)
+    get_store().tags.remove(user_id, tag)
     flash('Tag removida', 'success')
     return redirect(url_for('admin.dashboard'))
 
@@ -195,22 +228,24 @@ def ban_user():
     Rota para banir um usuário.
     - Verifica permissão de admin.
     - Impede banimento de outros administradores.
-    - Adiciona o email à lista de banidos (banned.csv).
+    - Adiciona o(s) email(s) à lista de banidos (banned.csv).
+    Aceita vários campos `email` para banir em lote.
     """
     if not admin_required():
         flash('Somente admins', 'error'); return redirect(url_for('main.index'))
-    email = request.form.get('email','').strip().lower()
-    
-    # Verificar se o usuário alvo é admin
-    users = read_json(current_app.config['USERS_JSON'])
-    target_user = next((u for u in users if u['email'].lower() == email), None)
-    if target_user and target_user.get('is_admin'):
-        flash('Não é possível banir um administrador', 'error')
-        return redirect(url_for('admin.dashboard'))
+    emails = _form_emails()
+    users = get_store().users
+
+    # Verificar se algum usuário alvo é admin
+    for email in emails:
+        target_user = users.by_email(email)
+        if target_user and target_user.get('is_admin'):
+            flash('Não é possível banir um administrador', 'error')
+            return redirect(url_for('admin.dashboard'))
 
     reason = request.form.get('reason','')
-    add_ban(email, reason)
-    flash('Usuário banido', 'success')
+    add_bans(emails, reason)
+    flash('Usuário banido' if len(emails) == 1 else f'{len(emails)} usuários banidos', 'success')
     return redirect(url_for('admin.dashboard'))
 
 @bp.route('/promote_user', methods=['POST'])
@@ -223,17 +258,9 @@ def promote_user():
     if not admin_required():
         flash('Somente admins', 'error'); return redirect(url_for('main.index'))
     user_id = request.form.get('user_id')
-    users = read_json(current_app.config['USERS_JSON'])
-    
-    changed = False
-    for u in users:
-        if u['id'] == user_id:
-            u['is_admin'] = True
-            changed = True
-            break
+    changed = get_store().users.patch(user_id, lambda u: {'is_admin': True}) is not None
     
     if changed:
-        write_json(current_app.config['USERS_JSON'], users)
         flash('Usuário promovido a admin', 'success')
     else:
         flash('Usuário não encontrado', 'error')
@@ -252,17 +279,9 @@ def demote_user():
         return redirect(url_for('admin.dashboard'))
         
     user_id = request.form.get('user_id')
-    users = read_json(current_app.config['USERS_JSON'])
-    
-    changed = False
-    for u in users:
-        if u['id'] == user_id:
-            u['is_admin'] = False
-            changed = True
-            break
+    changed = get_store().users.patch(user_id, lambda u: {'is_admin': False}) is not None
             
     if changed:
-        write_json(current_app.config['USERS_JSON'], users)
         flash('Privilégios de admin removidos', 'success')
     else:
         flash('Usuário não encontrado', 'error')
@@ -274,11 +293,22 @@ def unban_user():
     """
     Rota para desbanir um usuário.
     - Verifica permissão de admin.
-    - Remove o email da lista de banidos (banned.csv).
+    - Remove o(s) email(s) da lista de banidos (banned.csv).
+    Aceita vários campos `email` para desbanir em lote.
     """
     if not admin_required():
         flash('Somente admins', 'error'); return redirect(url_for('main.index'))
-    email = request.form.get('email','').strip().lower()
-    remove_ban(email)
-    flash('Usuário desbanido', 'success')
+    emails = _form_emails()
+    remove_bans(emails)
+    flash('Usuário desbanido' if len(emails) == 1 else f'{len(emails)} usuários desbanidos', 'success')
     return redirect(url_for('admin.dashboard'))
+
+@bp.route('/metrics')
+def metrics():
+    """
+    Acertos e falhas dos caches deste worker (páginas, cards de post,
+    usuário logado e documentos JSON), em JSON.
+    """
+    if not admin_required():
+        return jsonify({'error': 'Admin required'}), 403
+    return jsonify(cache_stats())
@@ -2,21 +2,19 @@ from flask import render_template, request, redirect, url_for, flash, session, c
 from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 import os, uuid, datetime
-from ..utils_csv import read_json, append_json, write_json, ensure_json_file
+from ..storage import get_store
+from ..feed import post_views
+from ..cache import conditional_get
 from . import bp
 
 # bp = Blueprint('auth', __name__)
 
 def user_by_email(email):
     """
-    Busca um usuário pelo email no arquivo users.json.
+    Busca um usuário pelo email.
     Retorna o dicionário do usuário ou None se não encontrar.
     """
-    users = read_json(current_app.config['USERS_JSON'])
-    for u in users:
-        if u['email'].lower() == email.lower():
-            return u
-    return None
+    return get_store().users.by_email(email)
 def sanitize_nickname(n):
     """Normaliza nickname para uso em URL/handle: remove '@', espaços e caracteres inválidos, e usa minúsculas."""
     n = (n or '').strip()
@@ -28,114 +26,64 @@ def sanitize_nickname(n):
     return n.lower()
 
 def nickname_in_use(nick, exclude_user_id=None):
-    users = read_json(current_app.config['USERS_JSON'])
-    for u in users:
-        if exclude_user_id and u.get('id') == exclude_user_id:
-            continue
-        if (u.get('nickname','') or '').lower() == (nick or '').lower():
-            return True
-    return False
+    u = get_store().users.by_nickname(nick)
+    if not u:
+        return False
+    return not (exclude_user_id and u.get('id') == exclude_user_id)
 
 
 def user_by_id(uid):
     """
-    Busca um usuário pelo ID no arquivo users.json.
+    Busca um usuário pelo ID.
     Retorna o dicionário do usuário ou None se não encontrar.
     """
-    users = read_json(current_app.config['USERS_JSON'])
-    for u in users:
-        if u['id'] == uid:
-            return u
-    return None
+    return get_store().users.get(uid)
 
 def is_banned(email):
     """
-    Verifica se um email está na lista de banidos (banned.csv).
+    Verifica se um email está na lista de banidos.
     Retorna True se estiver banido, False caso contrário.
     """
-    banned_csv = current_app.config['BANNED_CSV']
-    if not os.path.exists(banned_csv):
-        return False
-    
-    try:
-        with open(banned_csv, 'r', newline='', encoding='utf-8') as f:
-            lines = f.readlines()
-            for line in lines[1:]:  # Pula cabeçalho
-                parts = line.strip().split(',')
-                if len(parts) > 0 and parts[0].lower() == email.lower():
-                    return True
-    except FileNotFoundError:
-        return False
-    
-    return False
+    return get_store().bans.is_banned(email)
 
 def add_ban(email, reason):
     """
-    Adiciona um email ao arquivo banned.csv.
-    - Cria o arquivo e cabeçalho se não existirem.
-    - Registra email, motivo e data/hora do banimento.
+    Adiciona um email à lista de banidos.
+    Registra email, motivo e data/hora do banimento.
+    Retorna False se o email já estava banido.
     """
-    banned_csv = current_app.config['BANNED_CSV']
-    os.makedirs(os.path.dirname(banned_csv), exist_ok=True)
+    brasilia_tz = datetime.timezone(datetime.timedelta(hours=-3))
+    ban_at = datetime.datetime.now(brasilia_tz).strftime('%H:%M:%S %d/%m/%Y')
+    return get_store().bans.add(email, reason, ban_at)
 
-    # Evita duplicar banimento
-    if is_banned(email):
-        return False
-
-    # Cria cabeçalho se não existir
-    if not os.path.exists(banned_csv):
-        with open(banned_csv, 'w', newline='', encoding='utf-8') as f:
-            f.write('email,ban_reason,ban_at\n')
-
-    # Acrescenta a linha
-    with open(banned_csv, 'a', newline='', encoding='utf-8') as f:
-        brasilia_tz = datetime.timezone(datetime.timedelta(hours=-3))
-        ban_at = datetime.datetime.now(brasilia_tz).strftime('%H:%M:%S %d/%m/%Y')
-        # Substitui vírgulas na razão para não quebrar o CSV simples
-        safe_reason = (reason or '').replace(',', ' ')
-        f.write(f"{email},{safe_reason},{ban_at}\n")
-    return True
+def add_bans(emails, reason):
+    """
+    Bane vários emails de uma vez (uma única gravação).
+    Retorna quantos ainda não estavam banidos.
+    """
+    brasilia_tz = datetime.timezone(datetime.timedelta(hours=-3))
+    ban_at = datetime.datetime.now(brasilia_tz).strftime('%H:%M:%S %d/%m/%Y')
+    return get_store().bans.add_many([(email, reason, ban_at) for email in emails])
 
 def get_all_bans():
     """
-    Lê o arquivo banned.csv e retorna uma lista de dicionários com todos os banimentos.
+    Retorna uma lista de dicionários com todos os banimentos.
     Cada item contém: email, reason (motivo) e at (data/hora).
     """
-    banned_csv = current_app.config['BANNED_CSV']
-    bans = []
-    if os.path.exists(banned_csv):
-        with open(banned_csv, 'r', newline='', encoding='utf-8') as f:
-            lines = f.readlines()
-            for line in lines[1:]:
-                parts = line.strip().split(',')
-                if len(parts) >= 3:
-                    bans.append({
-                        'email': parts[0],
-                        'reason': parts[1],
-                        'at': parts[2]
-                    })
-    return bans
+    return get_store().bans.all()
 
 def remove_ban(email):
     """
-    Remove um email da lista de banidos (banned.csv).
-    Reescreve o arquivo mantendo apenas os emails que não correspondem ao informado.
+    Remove um email da lista de banidos.
     """
-    banned_csv = current_app.config['BANNED_CSV']
-    if not os.path.exists(banned_csv):
-        return
-    
-    lines = []
-    with open(banned_csv, 'r', newline='', encoding='utf-8') as f:
-        lines = f.readlines()
-    
-    with open(banned_csv, 'w', newline='', encoding='utf-8') as f:
-        if lines:
-            f.write(lines[0]) # Header
-            for line in lines[1:]:
-                parts = line.strip().split(',')
-                if len(parts) > 0 and parts[0].lower() != email.lower():
-                    f.write(line)
+    get_store().bans.remove(email)
+
+def remove_bans(emails):
+    """
+    Remove vários emails da lista de banidos de uma vez.
+    Retorna quantos estavam banidos.
+    """
+    return get_store().bans.remove_many(emails)
 
 def ensure_user_upload_dirs(user_id):
     """Cria a estrutura de uploads por usuário: perfil, capa e posts."""
@@ -144,24 +92,6 @@ def ensure_user_upload_dirs(user_id):
     os.makedirs(os.path.join(base, 'cover'), exist_ok=True)
     os.makedirs(os.path.join(base, 'posts'), exist_ok=True)
 
-@bp.before_request
-def ensure_files():
-    """
-    Executado antes de cada requisição neste Blueprint.
-    Garante que todos os arquivos de dados (JSON e CSV) necessários existam.
-    """
-    ensure_json_file(current_app.config['USERS_JSON'])
-    ensure_json_file(current_app.config['POSTS_JSON'])
-    ensure_json_file(current_app.config['COMMENTS_JSON'])
-    ensure_json_file(current_app.config['TAGS_JSON'])
-    
-    # Garante que banned.csv existe com cabeçalho
-    banned_csv = current_app.config['BANNED_CSV']
-    os.makedirs(os.path.dirname(banned_csv), exist_ok=True)
-    if not os.path.exists(banned_csv):
-        with open(banned_csv, 'w', newline='', encoding='utf-8') as f:
-            f.write('email,ban_reason,ban_at\n')
-
 @bp.route('/register', methods=['GET','POST'])
 def register():
     """
@@ -204,7 +134,7 @@ def register():
             'profile_image': '',
             'created_at': datetime.datetime.now(brasilia_tz).strftime('%H:%M:%S %d/%m/%Y')
         }
-        append_json(current_app.config['USERS_JSON'], row)
+        get_store().users.add(row)
         # cria estrutura de uploads do usuário
         ensure_user_upload_dirs(uid)
         flash('Conta criada! Faça login', 'success')
@@ -266,6 +196,7 @@ def logout():
     return redirect(url_for('main.index'))
 
 @bp.route('/profile', methods=['GET','POST'])
+@conditional_get('users', 'posts', 'comments', 'likes')
 def profile():
     """
     Rota de Perfil do Usuário.
@@ -277,8 +208,7 @@ def profile():
     if 'user_id' not in session:
         flash('Faça login primeiro', 'error')
         return redirect(url_for('auth.login'))
-    users = read_json(current_app.config['USERS_JSON'])
-    me = next((u for u in users if u['id'] == session['user_id']), None)
+    me = get_store().users.get(session['user_id'])
     if not me:
         session.clear()
         flash('Usuário não encontrado', 'error')
@@ -324,7 +254,8 @@ def profile():
             c.save(path)
             me['cover_image'] = f"uploads/{me['id']}/cover/{newname}"
 
-        write_json(current_app.config['USERS_JSON'], users)
+        fields = {k: me[k] for k in ('nickname', 'nome', 'profile_image', 'cover_image') if k in me}
+        get_store().users.patch(me['id'], lambda u: fields)
         session['nickname'] = me['nickname']
         flash('Perfil atualizado', 'success')
         return redirect(url_for('auth.profile'))
@@ -351,15 +282,8 @@ def profile():
                 joined_date = created
 
     # Fetch user posts
-    all_posts = read_json(current_app.config['POSTS_JSON'])
-    user_posts = []
-    for p in all_posts:
-        if p.get('author_id') == session['user_id']:
-            # Enrich post with author info for the template
-            p['author_nick'] = me['nickname']
-            p['author_image'] = me.get('profile_image', '')
-            user_posts.append(p)
-            
-    user_posts.reverse() # Show newest first
+    store = get_store()
+    # Mais recentes primeiro (antes só invertia a ordem do arquivo)
+    user_posts = post_views(store, store.posts.recent(author_id=session['user_id']), current_user_id=me['id'])
     
     return render_template('profile.html', user=me, posts=user_posts, is_owner=True, joined_date=joined_date)
@@ -0,0 +1,144 @@
+"""
+Cache, por worker, de páginas renderizadas e de cards de post.
+
+- Páginas: respostas de GET de visitantes anônimos (sem login e sem
+  mensagens flash pendentes) ficam guardadas por host + URL (a página traz
+  URLs absolutas) junto com a versão dos dados de que ela depende
+  (`content_version`). Enquanto nenhuma escrita mudar essa versão
+  (inclusive feita por outro worker), a página é servida sem ler dados
+  nem renderizar templates.
+- Cards: `post_card(p)` (global dos templates) guarda o HTML de cada
+  `components/post_card.html`. A chave é o próprio PostView (já traz
+  contadores, curtidas e autor) mais o que o card lê da sessão, então um
+  post alterado gera outra chave e a entrada velha sai pelo LRU.
+- Validadores: `conditional_get` põe um ETag forte (versão dos dados +
+  quem está vendo) nas respostas e responde 304 a um If-None-Match igual,
+  sem chamar a view nem renderizar nada.
+"""
+import hashlib
+from functools import wraps
+
+from flask import current_app, g, make_response, render_template, request, session
+from markupsafe import Markup
+
+from .storage import get_store
+from .utils_csv import json_cache_stats
+
+# Cabeçalhos que não podem ser reaproveitados entre visitantes
+_PRIVATE_HEADERS = ('Set-Cookie',)
+
+
+def content_version(store, names):
+    """
+    Versão atual das coleções informadas (ver Store.data_version).
+    'likes' vem do armazenamento de curtidas, que é comum aos dois backends.
+    Calculada uma vez por requisição para cada conjunto de coleções.
+    """
+    versions = g.setdefault('content_versions', {})
+    if names not in versions:
+        version = store.data_version(*[n for n in names if n != 'likes'])
+        if 'likes' in names:
+            version += (store.likes.version(),)
+        versions[names] = version
+    return versions[names]
+
+
+def is_anonymous():
+    """Requisição sem usuário logado e sem flash pendente: a página é a mesma para todos."""
+    return 'user_id' not in session and not session.get('_flashes')
+
+
+def cached_page(*names):
+    """
+    Decorador de view: guarda a resposta de GETs anônimos enquanto a versão
+    das coleções `names` não mudar.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or not is_anonymous():
+                return view(*args, **kwargs)
+            cache = current_app.extensions['page_cache']
+            # a página traz URLs absolutas (links de compartilhar): uma por host/esquema
+            key = (request.host_url, request.full_path)
+            version = content_version(get_store(), names)
+            cached = cache.get(key, version)
+            if cached is not None:
+                body, status, headers = cached
+                response = current_app.response_class(body, status=status, headers=headers)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = make_response(view(*args, **kwargs))
+            # só páginas completas e que não mexeram na sessão (ex.: flash)
+            if response.status_code == 200 and not response.direct_passthrough and not session.modified:
+                headers = [(k, v) for k, v in response.headers.items() if k not in _PRIVATE_HEADERS]
+                cache.put(key, (response.get_data(), response.status_code, headers), version)
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional_get(*names):
+    """
+    Decorador de view: ETag derivado da versão das coleções `names`, do
+    host + URL e do usuário da sessão; If-None-Match igual recebe 304 sem
+    renderizar.
+    Requisições com flash pendente não usam validadores (a mensagem só
+    aparece uma vez).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            viewer = (session.get('user_id'), bool(session.get('is_admin')), session.get('nickname'))
+            state = repr((request.host_url, request.full_path, content_version(get_store(), names), viewer))
+            etag = hashlib.sha1(state.encode('utf-8')).hexdigest()
+            cache_control = 'no-cache' if viewer[0] is None else 'private, no-cache'
+
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200 or session.modified:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = cache_control
+            return response
+        return wrapper
+    return decorator
+
+
+def post_card(p):
+    """Renderiza components/post_card.html para o PostView `p`, reaproveitando o HTML em cache."""
+    user = g.get('current_user')
+    key = (p, session.get('user_id'), bool(session.get('is_admin')), session.get('nickname'),
+           (user or {}).get('profile_image'), request.host_url)
+    cache = current_app.extensions['fragment_cache']
+    html = cache.get(key)
+    if html is None:
+        html = Markup(render_template('components/post_card.html', p=p, current_user=user))
+        cache.put(key, html)
+    return html
+
+
+def cache_stats():
+    """
+    Acertos/falhas dos caches deste worker (páginas, cards, usuário logado,
+    JSON e notícias), contadores das chamadas externas por provedor e do
+    índice espacial e do catálogo de pontos de coleta.
+    """
+    ext = current_app.extensions
+    return {
+        'page_cache': ext['page_cache'].stats(),
+        'fragment_cache': ext['fragment_cache'].stats(),
+        'current_user_cache': ext['current_user_cache'].stats(),
+        'json_cache': json_cache_stats(),
+        'news': ext['news'].stats(),
+        'http': ext['http'].stats(),
+        'geocode': ext['geocoder'].stats(),
+        'point_index': ext['point_index'].stats(),
+        'waste_catalog': ext['waste_catalog'].stats()
+    }
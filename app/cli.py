@@ -0,0 +1,57 @@
+import click
+
+from .point_import import PointImportError
+from .storage.json_backend import JsonStore
+from .storage.sqlite_backend import SqliteStore
+
+
+def register_commands(app):
+    """Registra os comandos de linha de comando (flask --app run <comando>)."""
+
+    @app.cli.command('import-sqlite')
+    def import_sqlite():
+        """Importa os arquivos JSON/CSV de data/ para o banco SQLite (SQLITE_PATH)."""
+        source = JsonStore(app.config)
+        target = SqliteStore(app.config['SQLITE_PATH'])
+        counts = target.import_from(source)
+        for name, n in counts.items():
+            click.echo(f"{name}: {n}")
+        click.echo(f"Importado para {app.config['SQLITE_PATH']}")
+
+    @app.cli.command('verify-data')
+    @click.option('--repair', is_flag=True, help='Recria arquivos/tabelas que estiverem faltando.')
+    def verify_data(repair):
+        """Confere os dados do backend atual (ex.: depois de restaurar um backup)."""
+        store = app.extensions['store']
+        problems = store.verify(repair=repair)
+        for problem in problems:
+            click.echo(problem)
+        if not problems:
+            click.echo('Dados OK')
+        elif repair:
+            click.echo('Arquivos/tabelas faltando foram recriados')
+
+    @app.cli.command('import-points')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    def import_points(path):
+        """Importa pontos de coleta de um arquivo .csv ou .geojson (geocodifica os que não têm coordenadas)."""
+        importer = app.extensions['point_import']
+
+        def report(job):
+            done = job.geocoded + job.not_found + job.unavailable
+            click.echo(f"geocodificados {done}/{job.to_geocode}")
+
+        try:
+            with open(path, 'rb') as f:
+                job = importer.run(f, path, on_progress=report)
+        except (PointImportError, UnicodeDecodeError) as e:
+            raise click.ClickException(str(e))
+        for error in job.errors:
+            click.echo(error)
+        click.echo(f"linhas: {job.rows}, inválidas: {job.invalid}, repetidas: {job.duplicates}, "
+                   f"sem localização: {job.not_found + job.unavailable}, "
+                   f"localização aproximada: {job.approximate}, adicionados: {job.added}")
+        if job.status == 'failed':
+            raise click.ClickException(job.error)
+        if job.error:
+            click.echo(job.error)
@@ -12,17 +12,73 @@ class Config:
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'static', 'uploads')
     DATA_FOLDER = os.path.join(BASE_DIR, 'data')
     
+    # Storage
+    # Backend de dados: 'json' (arquivos em data/) ou 'sqlite'
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+    SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(DATA_FOLDER, 'sos_jampa.db'))
+
     # JSON Files
     # Caminhos para os arquivos de dados JSON
     USERS_JSON = os.path.join(DATA_FOLDER, 'users.json')
     POSTS_JSON = os.path.join(DATA_FOLDER, 'posts.json')
     COMMENTS_JSON = os.path.join(DATA_FOLDER, 'comments.json')
     TAGS_JSON = os.path.join(DATA_FOLDER, 'tags.json')
+    # Curtidas: snapshot + log append-only (likes.log.jsonl), consolidado
+    # a cada LIKES_FLUSH_SECONDS (usado pelos dois backends)
+    LIKES_JSON = os.path.join(DATA_FOLDER, 'likes.json')
+    LIKES_FLUSH_SECONDS = float(os.environ.get('LIKES_FLUSH_SECONDS', 30))
     
     # API Keys
     NEWSDATA_API_KEY = os.environ.get('NEWSDATA_API_KEY', 'pub_75d0f8133078426595f22f22e71631b3')
     NEWSAPI_KEY = os.environ.get('NEWSAPI_KEY', 'cc2b5389cfb049ba8d27f2b171fa843b') # https://newsapi.org
     COLLECTION_POINTS_JSON = os.path.join(DATA_FOLDER, 'collection_points.json')
+
+    # pontos de coleta próximos (app.spatial)
+    # Tamanho das células da grade do índice espacial (graus; 0.01 ~ 1,1 km)
+    # e limites aceitos em /collection-points/nearby
+    SPATIAL_CELL_DEG = float(os.environ.get('SPATIAL_CELL_DEG', 0.01))
+    NEARBY_MAX_RESULTS = int(os.environ.get('NEARBY_MAX_RESULTS', 200))
+    NEARBY_MAX_RADIUS_KM = float(os.environ.get('NEARBY_MAX_RADIUS_KM', 50))
+
+    # notícias
+    # Resultado de cada busca fica NEWS_CACHE_TTL segundos em cache; depois
+    # disso, por até NEWS_MAX_STALE segundos, a cópia velha é servida
+    # enquanto a nova é buscada em segundo plano
+    NEWS_CACHE_TTL = int(os.environ.get('NEWS_CACHE_TTL', 600))
+    NEWS_MAX_STALE = int(os.environ.get('NEWS_MAX_STALE', 3600))
+    NEWS_TIMEOUT = float(os.environ.get('NEWS_TIMEOUT', 5))
+    # Consultas diferentes buscadas ao mesmo tempo sem uma esperar a outra
+    NEWS_MAX_INFLIGHT = int(os.environ.get('NEWS_MAX_INFLIGHT', 8))
+    NEWSDATA_URL = os.environ.get('NEWSDATA_URL', 'https://newsdata.io/api/1/latest')
+    NEWSAPI_URL = os.environ.get('NEWSAPI_URL', 'https://newsapi.org/v2/everything')
+    NOMINATIM_URL = os.environ.get('NOMINATIM_URL', 'https://nominatim.openstreetmap.org/search')
+
+    # geocodificação (app.geocoding)
+    # Geocodificadores tentados em ordem: 'gazetteer' (bairros e avenidas do
+    # arquivo GAZETTEER_CSV, sem rede; cobre só parte da cidade, cerca de 90
+    # entradas) e 'nominatim' (OpenStreetMap)
+    GEOCODERS = [g.strip() for g in os.environ.get('GEOCODERS', 'gazetteer,nominatim').split(',') if g.strip()]
+    GAZETTEER_CSV = os.path.join(BASE_DIR, 'geodata', 'gazetteer_joao_pessoa.csv')
+    # Cache em disco por endereço normalizado: encontrados valem GEOCODE_CACHE_TTL
+    # segundos, não encontrados GEOCODE_NEGATIVE_TTL; no máximo uma consulta ao
+    # Nominatim a cada GEOCODE_MIN_INTERVAL segundos (somando os workers)
+    GEOCODE_CACHE_JSON = os.path.join(DATA_FOLDER, 'geocode_cache.json')
+    GEOCODE_CACHE_TTL = int(os.environ.get('GEOCODE_CACHE_TTL', 30 * 86400))
+    GEOCODE_NEGATIVE_TTL = int(os.environ.get('GEOCODE_NEGATIVE_TTL', 86400))
+    GEOCODE_MIN_INTERVAL = float(os.environ.get('GEOCODE_MIN_INTERVAL', 1.0))
+    # Importação de pontos em lote: endereços geocodificados POINT_IMPORT_BATCH_SIZE
+    # por vez (com o intervalo do Nominatim, um lote leva ~BATCH_SIZE segundos)
+    POINT_IMPORT_BATCH_SIZE = int(os.environ.get('POINT_IMPORT_BATCH_SIZE', 5))
+    POINT_IMPORTS_JSON = os.path.join(DATA_FOLDER, 'point_imports.json')
+
+    # chamadas a serviços externos (app.http_client)
+    # Repetições de falhas transitórias e circuit breaker por provedor: depois de
+    # HTTP_BREAKER_FAILURES falhas seguidas, falha na hora por HTTP_BREAKER_RESET segundos
+    HTTP_TIMEOUT = float(os.environ.get('HTTP_TIMEOUT', 5))
+    HTTP_RETRIES = int(os.environ.get('HTTP_RETRIES', 2))
+    HTTP_BREAKER_FAILURES = int(os.environ.get('HTTP_BREAKER_FAILURES', 5))
+    HTTP_BREAKER_RESET = float(os.environ.get('HTTP_BREAKER_RESET', 30))
+    HTTP_USER_AGENT = 'projeto_pweb_waste_app'
     
     # CSV File (only banned)
     # Caminho para o arquivo CSV de usuários banidos
@@ -35,3 +91,26 @@ class Config:
     MAX_IMAGE_DIM = 1600
 
     REMEMBER_COOKIE_DURATION = timedelta(days=7)
+
+    # cache
+    # Quantidade máxima de arquivos JSON mantidos em memória por worker
+    JSON_CACHE_MAX_ENTRIES = int(os.environ.get('JSON_CACHE_MAX_ENTRIES', 16))
+
+    # journal
+    # Usuários, posts e comentários gravados em journal append-only (.journal.jsonl),
+    # compactado no snapshot JSON quando passa de JOURNAL_MAX_BYTES
+    JSON_JOURNAL = os.environ.get('JSON_JOURNAL', '1') == '1'
+    JOURNAL_MAX_BYTES = int(os.environ.get('JOURNAL_MAX_BYTES', 256 * 1024))
+
+    # usuário logado
+    # Usuários logados resolvidos mantidos em cache por worker
+    CURRENT_USER_CACHE_SIZE = int(os.environ.get('CURRENT_USER_CACHE_SIZE', 1024))
+
+    # páginas e cards renderizados
+    # Páginas de visitantes anônimos e cards de post mantidos em cache por worker
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE', 256))
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 2048))
+
+    # feed
+    # Posts por página no feed (a página seguinte vem pelo cursor / rolagem infinita)
+    FEED_PAGE_SIZE = int(os.environ.get('FEED_PAGE_SIZE', 20))
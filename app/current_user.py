@@ -0,0 +1,30 @@
+"""
+Cache, por worker, do usuário logado já resolvido.
+
+Cada entrada guarda o usuário e se ele está banido, junto com a versão dos
+dados de usuários e banimentos (`store.data_version('users', 'bans')`) com
+que foi resolvido. Enquanto a versão não muda, a requisição não consulta
+os repositórios; um banimento ou edição de perfil (inclusive feito por
+outro worker) muda a versão e vale já na próxima requisição.
+"""
+from .lru import LRUCache
+from .utils_csv import clone_json
+
+
+class CurrentUserCache(LRUCache):
+    def __init__(self, max_entries=1024):
+        super().__init__(max_entries)
+
+    def resolve(self, store, user_id):
+        """
+        Retorna (usuário ou None, banido) para o id da sessão.
+        O usuário retornado é uma cópia (pode ser alterado por quem chamou).
+        """
+        version = store.data_version('users', 'bans')
+        entry = self.get(user_id, version)
+        if entry is None:
+            user = store.users.get(user_id)
+            entry = (user, bool(user) and store.bans.is_banned(user['email']))
+            self.put(user_id, entry, version)
+        user, banned = entry
+        return (clone_json(user) if user is not None else None), banned
@@ -0,0 +1,206 @@
+"""
+Montagem dos dados de exibição do feed (posts e comentários com autor).
+
+Em vez de procurar o autor de cada post com uma busca linear na lista de
+usuários, os autores são buscados de uma vez (`users.get_many`) e ligados
+aos posts por um dicionário: O(posts + autores).
+Os registros carregados não são alterados; cada item vira um objeto
+imutável próprio para o template ou para o JSON da API.
+
+O feed é paginado por cursor (created_ts, id): cada página traz os posts
+estritamente mais antigos que o último da página anterior, então inserções
+novas não duplicam nem pulam itens durante a rolagem.
+"""
+from dataclasses import dataclass, asdict
+
+from .timestamps import sort_ts
+from .search import post_tags
+
+
+@dataclass(frozen=True)
+class Author:
+    id: str
+    nickname: str
+    image: str
+
+
+ANONYMOUS = Author(id='', nickname='Anônimo', image='')
+
+
+@dataclass(frozen=True)
+class PostView:
+    id: str
+    author_id: str
+    author_nick: str
+    author_image: str
+    description: str
+    address: str
+    image_path: str
+    created_at: str
+    tags: str
+    likes_count: int
+    comments_count: int
+    user_liked: bool
+
+
+@dataclass(frozen=True)
+class CommentView:
+    id: str
+    post_id: str
+    author_id: str
+    author_nick: str
+    author_image: str
+    text: str
+    created_at: str
+    can_delete: bool
+
+    def to_dict(self):
+        d = asdict(self)
+        del d['author_id']
+        return d
+
+
+def author_map(store, author_ids):
+    """Busca os autores informados de uma só vez: {id: Author}."""
+    users = store.users.get_many(set(author_ids))
+    return {uid: Author(id=uid, nickname=u.get('nickname', ''), image=u.get('profile_image') or '')
+            for uid, u in users.items()}
+
+
+def post_views(store, posts, current_user_id=None, comment_counts=None, authors=None):
+    """
+    Converte posts em PostView com os dados do autor, curtidas e contador
+    de comentários. `comment_counts` (opcional) evita consultar o contador
+    quando quem chama já sabe quantos comentários cada post tem.
+    """
+    if authors is None:
+        authors = author_map(store, (p.get('author_id') for p in posts))
+    if comment_counts is None:
+        comment_counts = store.comments.counts([p['id'] for p in posts])
+    likes = store.likes.summary([p['id'] for p in posts], current_user_id)
+    views = []
+    for p in posts:
+        author = authors.get(p.get('author_id'), ANONYMOUS)
+        likes_count, user_liked = likes[p['id']]
+        views.append(PostView(
+            id=p['id'],
+            author_id=p.get('author_id', ''),
+            author_nick=author.nickname,
+            author_image=author.image,
+            description=p.get('description', ''),
+            address=p.get('address', ''),
+            image_path=p.get('image_path', ''),
+            created_at=p.get('created_at', ''),
+            tags=p.get('tags', ''),
+            likes_count=likes_count,
+            comments_count=comment_counts.get(p['id'], 0),
+            user_liked=user_liked,
+        ))
+    return views
+
+
+def comment_views(store, comments, current_user_id=None, is_admin=False, authors=None):
+    """Converte comentários em CommentView com os dados do autor."""
+    if authors is None:
+        authors = author_map(store, (c.get('author_id') for c in comments))
+    views = []
+    for c in comments:
+        author = authors.get(c.get('author_id'), ANONYMOUS)
+        views.append(CommentView(
+            id=c['id'],
+            post_id=c.get('post_id', ''),
+            author_id=c.get('author_id', ''),
+            author_nick=author.nickname,
+            author_image=author.image,
+            text=c.get('text', ''),
+            created_at=c.get('created_at', ''),
+            can_delete=(bool(current_user_id) and current_user_id == c.get('author_id')) or bool(is_admin),
+        ))
+    return views
+
+
+def sort_key(record):
+    return (sort_ts(record), record.get('id') or '')
+
+
+def encode_cursor(key):
+    """Chave de ordenação (números..., id) -> cursor 'n1_n2_id'."""
+    return '_'.join([repr(n) for n in key[:-1]] + [key[-1]])
+
+
+def decode_cursor(cursor, size=2):
+    """Cursor -> chave com `size` partes (números..., id), ou None se ausente/inválido."""
+    parts = (cursor or '').split('_', size - 1)
+    if len(parts) != size or not parts[-1]:
+        return None
+    try:
+        return tuple(float(n) for n in parts[:-1]) + (parts[-1],)
+    except ValueError:
+        return None
+
+
+def comment_page(comments, cursor=None, limit=10):
+    """
+    Comentários de um post em ordem cronológica, a partir do cursor (chave
+    (created_ts, id) do último já exibido). Retorna (página, próximo cursor ou None).
+    """
+    after = decode_cursor(cursor)
+    if after is not None:
+        comments = [c for c in comments if sort_key(c) > after]
+    page = comments[:limit]
+    next_cursor = encode_cursor(sort_key(page[-1])) if len(comments) > limit else None
+    return page, next_cursor
+
+
+def post_activity(store, post_ids, current_user_id=None, is_admin=False, limit=10, cursors=None):
+    """
+    Comentários (uma página por post), contadores e curtidas de vários posts,
+    com uma consulta em lote para cada coisa.
+    Retorna {post_id: {comments, next_cursor, comments_count, likes_count, liked}}.
+    `cursors`: {post_id: cursor} para pedir a página seguinte de comentários.
+    """
+    cursors = cursors or {}
+    comments = store.comments.by_posts(post_ids)
+    counts = store.comments.counts(post_ids)
+    likes = store.likes.summary(post_ids, current_user_id)
+    pages = {pid: comment_page(comments.get(pid, []), cursors.get(pid), limit) for pid in post_ids}
+    authors = author_map(store, (c.get('author_id') for page, _ in pages.values() for c in page))
+    result = {}
+    for pid in post_ids:
+        page, next_cursor = pages[pid]
+        views = comment_views(store, page, current_user_id=current_user_id, is_admin=is_admin, authors=authors)
+        likes_count, liked = likes[pid]
+        result[pid] = {
+            'comments': [v.to_dict() for v in views],
+            'next_cursor': next_cursor,
+            'comments_count': counts.get(pid, 0),
+            'likes_count': likes_count,
+            'liked': liked
+        }
+    return result
+
+
+def recent_page(store, cursor=None, limit=20, author_id=None, tag=None):
+    """
+    Página do feed, do mais recente para o mais antigo, lida do índice de
+    recência do repositório (opcionalmente só de um autor ou de uma tag). Retorna (posts da página, próximo cursor ou None).
+    """
+    posts = store.posts.recent(limit + 1, before=decode_cursor(cursor), author_id=author_id, tag=tag)
+    page = posts[:limit]
+    next_cursor = encode_cursor(sort_key(page[-1])) if len(posts) > limit else None
+    return page, next_cursor
+
+
+def search_page(store, query, cursor=None, limit=20, tag=''):
+    """
+    Página dos resultados da busca, do mais relevante para o menos.
+    O cursor é a chave (relevância, created_ts, id) do último resultado.
+    """
+    before = decode_cursor(cursor, size=3)
+    results = store.posts.search(query, limit=None if tag else limit + 1, before=before)
+    if tag:
+        results = [r for r in results if tag in post_tags(r[1])][:limit + 1]
+    page = results[:limit]
+    next_cursor = encode_cursor(page[-1][0]) if len(results) > limit else None
+    return [post for _, post in page], next_cursor
+
@@ -0,0 +1,434 @@
+"""
+Geocodificação de endereços de João Pessoa.
+
+Os geocodificadores implementam `GeocoderBackend.search(endereço)` e são
+tentados em ordem (`GEOCODERS`, padrão 'gazetteer,nominatim'):
+
+- gazetteer: centróides de bairros e avenidas conhecidos, de um arquivo
+  que vem com o app (`GAZETTEER_CSV`), em memória e com busca aproximada
+  sem acentos. Não depende de rede. Só responde direto quando o endereço
+  é só o nome de um bairro ou logradouro (sem número nem outras partes).
+  A tabela é pequena (cerca de 90 entradas: parte dos bairros e as
+  avenidas principais) e cobre só parte da cidade.
+- nominatim: OpenStreetMap, chamado direto pelo cliente HTTP compartilhado
+  (app.http_client), para endereços completos e o que o gazetteer não
+  reconhece.
+
+Se ninguém encontra o endereço (ou o Nominatim está fora do ar), o
+centróide do bairro/logradouro citado, se ele estiver no gazetteer, é
+usado como último recurso, com 'precision': 'approximate' no resultado
+(os demais vêm com 'exact'). Fora da área coberta pelo gazetteer não há
+esse último recurso.
+
+No nominatim:
+- Cache em disco (`GEOCODE_CACHE_JSON`) com chave do endereço normalizado
+  (minúsculas, sem acentos, espaços e "S/N" padronizados, com o sufixo da
+  cidade). Resultados valem `ttl` segundos; endereços não encontrados
+  também ficam em cache, por `negative_ttl`. Como o arquivo passa pelo
+  cache de JSON (utils_csv.read_json), uma busca repetida custa um stat.
+- As consultas ao Nominatim passam por uma fila única por worker que
+  respeita o intervalo mínimo entre requisições (política de uso: 1/s),
+  combinado entre os workers por um arquivo de controle, e junta pedidos
+  iguais que já estão na fila.
+"""
+import csv
+import difflib
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import requests
+from flask import current_app
+
+from .http_client import CircuitOpenError, HttpError
+from .search import fold
+from .utils_csv import read_json, update_json, clone_json, file_lock
+
+CITY_SUFFIX = "João Pessoa, PB, Brasil"
+_CITY_KEY = fold(CITY_SUFFIX)
+
+# parte do endereço que é só o número da casa: '100', 'nº 100', '100A'
+_HOUSE_NUMBER_RE = re.compile(r'^(?:n[º°o.]?\s*)?\d+[a-z]?$')
+_TRAILING_NUMBER_RE = re.compile(r'\s(?:n[º°o.]?\s*)?\d+[a-z]?$')
+
+_SN_RE = re.compile(r'\b(?:s\s*/\s*n|s\.\s*n\.?|sem\s+numero)(?=\W|$)')
+
+
+class GeocodingUnavailable(Exception):
+    """O serviço de geocodificação não respondeu (circuito aberto ou fila demorada)."""
+
+
+def normalize_address(address):
+    """
+    Chave do cache: 'Av. Epitácio  Pessoa, S/N' -> 'av epitacio pessoa, s/n, joao pessoa, pb, brasil'.
+    """
+    text = fold(address)
+    text = _SN_RE.sub('s/n', text).replace('.', ' ')
+    text = re.sub(r'\s*,\s*', ', ', text)
+    text = re.sub(r'\s*-\s*', ' - ', text)
+    text = ' '.join(text.split()).strip(' ,-')
+    if not text.endswith(_CITY_KEY):
+        text = f"{text}, {_CITY_KEY}" if text else _CITY_KEY
+    return text
+
+
+def has_house_number(address):
+    """
+    Se o endereço traz número de casa ('Rua X, 100', 'Av. Y 250 - Bairro').
+    'S/N' não conta, nem número que faz parte do nome ('Rua 13 de Maio', 'BR-230').
+    """
+    for part in re.split(r'[,;]|\s-\s', fold(address)):
+        part = ' '.join(part.split())
+        if _HOUSE_NUMBER_RE.match(part):
+            return True
+        if part.split(' ', 1)[0].rstrip('.') in STREET_PREFIXES and _TRAILING_NUMBER_RE.search(part):
+            return True
+    return False
+
+
+def with_city(address):
+    """Endereço com o contexto da cidade (melhora a busca no Nominatim)."""
+    address = ' '.join((address or '').split()).strip(' ,')
+    if fold(address).endswith(_CITY_KEY):
+        return address
+    return f"{address}, {CITY_SUFFIX}"
+
+
+def nominatim_search(client, query, url, timeout=None):
+    """Primeiro resultado do Nominatim: {'lat', 'lon', 'display_name'} ou None."""
+    results = client.get_json('nominatim', url, params={'q': query, 'format': 'json', 'limit': 1},
+                              timeout=timeout)
+    if not results:
+        return None
+    first = results[0]
+    return {'lat': float(first['lat']), 'lon': float(first['lon']),
+            'display_name': first.get('display_name', '')}
+
+
+class GeocodeCache:
+    """Arquivo JSON {chave: {'result': {...} ou None, 'at': epoch}}."""
+    def __init__(self, path, ttl, negative_ttl):
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _fresh(self, entry, now):
+        ttl = self.ttl if entry.get('result') is not None else self.negative_ttl
+        return now - entry.get('at', 0) < ttl
+
+    def get(self, key):
+        """(True, resultado ou None) se a chave está em cache e não expirou; senão (False, None)."""
+        entries = read_json(self.path, copy=False)
+        entry = entries.get(key) if isinstance(entries, dict) else None
+        if entry is not None and self._fresh(entry, time.time()):
+            self.hits += 1
+            return True, clone_json(entry.get('result'))
+        self.misses += 1
+        return False, None
+
+    def put(self, key, result):
+        now = time.time()
+
+        def _store(entries):
+            if not isinstance(entries, dict):
+                entries = {}
+            # aproveita a gravação para descartar o que já expirou
+            entries = {k: e for k, e in entries.items() if self._fresh(e, now)}
+            entries[key] = {'result': result, 'at': round(now, 3)}
+            return entries
+        update_json(self.path, _store)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class RateLimitedQueue:
+    """
+    Fila com uma única thread que executa `func(key, arg, wait_turn)`; a
+    função chama `wait_turn()` antes de cada requisição externa, que espera
+    até passar `min_interval` segundos da anterior (contando todos os
+    workers: o horário da última chamada fica no mtime de `stamp_path`).
+    Pedidos com a mesma chave enquanto o primeiro não terminou recebem a
+    mesma Future.
+    """
+    def __init__(self, func, min_interval, stamp_path):
+        self.func = func
+        self.min_interval = min_interval
+        self.stamp_path = stamp_path
+        self.coalesced = 0
+        self._queue = queue.Queue()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, key, arg):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._inflight[key] = Future()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='geocode-queue', daemon=True)
+                self._thread.start()
+        self._queue.put((key, arg, future))
+        return future
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _wait_turn(self):
+        with file_lock(self.stamp_path):
+            try:
+                last = os.stat(self.stamp_path).st_mtime
+            except FileNotFoundError:
+                last = 0
+            delay = last + self.min_interval - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            with open(self.stamp_path, 'a'):
+                pass
+            os.utime(self.stamp_path)
+
+    def _run(self):
+        while True:
+            key, arg, future = self._queue.get()
+            try:
+                future.set_result(self.func(key, arg, self._wait_turn))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+
+
+class GeocoderBackend:
+    """Interface dos geocodificadores."""
+    name = None
+
+    def search(self, address):
+        """{'lat', 'lon', 'display_name'} ou None se o endereço não foi encontrado."""
+        raise NotImplementedError
+
+    def approximate(self, address):
+        """Posição aproximada (ex.: centro do bairro) para quando ninguém encontrou; None se não souber."""
+        return None
+
+    def stats(self):
+        return {}
+
+
+# Abreviações de logradouro -> forma por extenso
+STREET_PREFIXES = {
+    'av': 'avenida', 'avenida': 'avenida', 'r': 'rua', 'rua': 'rua', 'tv': 'travessa',
+    'travessa': 'travessa', 'pca': 'praca', 'pc': 'praca', 'praca': 'praca', 'al': 'alameda',
+    'alameda': 'alameda', 'rod': 'rodovia', 'rodovia': 'rodovia', 'parque': 'parque',
+}
+_NOISE_WORDS = frozenset({'bairro', 'conjunto', 'conj', 'de', 'do', 'dos', 'da', 'das', 'n', 'no', 's/n'})
+
+
+def gazetteer_key(text):
+    """'Av. Epitácio Pessoa' -> 'avenida epitacio pessoa'; 'Bairro dos Bancários' -> 'bancarios'."""
+    words = fold(text).replace('.', ' ').replace('º', ' ').replace('°', ' ').split()
+    if words and words[0] in STREET_PREFIXES:
+        words[0] = STREET_PREFIXES[words[0]]
+        return ' '.join(w for w in words if not w.isdigit())
+    while words and words[0] in _NOISE_WORDS:
+        words.pop(0)
+    return ' '.join(w for w in words if not w.isdigit() and w != 's/n')
+
+
+class GazetteerGeocoder(GeocoderBackend):
+    """
+    Bairros e logradouros do arquivo CSV (tipo,nome,lat,lon; apelidos do
+    mesmo lugar separados por '|'). Cada parte do endereço (separada por
+    vírgula ou hífen) é comparada com os nomes: primeiro exata, depois
+    aproximada (difflib, `cutoff`). Bairro tem preferência sobre logradouro:
+    o centróide de uma avenida longa pode ficar longe do ponto procurado.
+    `search` só responde quando o endereço é um único nome sem número: com
+    número ou rua + bairro, o centróide seria o mesmo para a rua ou o bairro
+    inteiro, então fica para `approximate` (último recurso da cadeia).
+    O arquivo que vem com o app cobre só parte dos bairros de João Pessoa;
+    endereços em bairros fora dele não têm esse último recurso.
+    """
+    name = 'gazetteer'
+
+    def __init__(self, path, cutoff=0.85):
+        self.path = path
+        self.cutoff = cutoff
+        self.hits = 0
+        self.misses = 0
+        self.deferred = 0
+        self.approximations = 0
+        # chave -> lugar; separados por ter ou não prefixo de logradouro
+        self.streets = {}
+        self.places = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', newline='', encoding='utf-8') as f:
+                rows = list(csv.DictReader(f))
+        except FileNotFoundError:
+            print(f"Gazetteer não encontrado: {self.path}")
+            return
+        for row in rows:
+            names = row['nome'].split('|')
+            place = {'lat': float(row['lat']), 'lon': float(row['lon']), 'kind': row['tipo'],
+                     'display_name': f"{names[0]}, {CITY_SUFFIX}"}
+            for name in names:
+                key = gazetteer_key(name)
+                target = self.streets if key.split(' ', 1)[0] in STREET_PREFIXES.values() else self.places
+                target.setdefault(key, place)
+
+    def _match(self, part, names):
+        if part in names:
+            return names[part]
+        close = difflib.get_close_matches(part, list(names), n=1, cutoff=self.cutoff)
+        return names[close[0]] if close else None
+
+    def _parts(self, address):
+        text = fold(address)
+        if text.endswith(_CITY_KEY):
+            text = text[:-len(_CITY_KEY)]
+        parts = (gazetteer_key(p) for p in re.split(r'[,;]|\s*-\s*', text))
+        return [p for p in parts if p]
+
+    def _lookup(self, parts):
+        matches = []
+        for part in parts:
+            prefixed = part.split(' ', 1)[0] in STREET_PREFIXES.values()
+            place = self._match(part, self.streets if prefixed else self.places)
+            if place is not None:
+                matches.append(place)
+        if not matches:
+            return None
+        best = next((m for m in matches if m['kind'] == 'bairro'), matches[0])
+        return {'lat': best['lat'], 'lon': best['lon'], 'display_name': best['display_name']}
+
+    def search(self, address):
+        parts = self._parts(address)
+        # só um nome (bairro ou logradouro); número ou rua + bairro vão para o Nominatim
+        if len(parts) > 1 or has_house_number(address):
+            self.deferred += 1
+            return None
+        result = self._lookup(parts)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def approximate(self, address):
+        result = self._lookup(self._parts(address))
+        if result is not None:
+            self.approximations += 1
+        return result
+
+    def stats(self):
+        return {'places': len(self.places) + len(self.streets), 'hits': self.hits, 'misses': self.misses,
+                'deferred': self.deferred, 'approximations': self.approximations}
+
+
+class NominatimGeocoder(GeocoderBackend):
+    """Cache em disco na frente do Nominatim, com as consultas passando pela fila."""
+    name = 'nominatim'
+
+    def __init__(self, search, cache_path, ttl=30 * 86400, negative_ttl=86400, min_interval=1.0,
+                 wait_timeout=10.0):
+        self._search = search
+        self.cache = GeocodeCache(cache_path, ttl, negative_ttl)
+        self.queue = RateLimitedQueue(self._resolve, min_interval, cache_path + '.rate')
+        self.wait_timeout = wait_timeout
+
+    def _resolve(self, key, query, wait_turn):
+        # outro worker pode ter resolvido enquanto o pedido esperava na fila
+        found, result = self.cache.get(key)
+        if found:
+            return result
+        wait_turn()
+        result = self._search(query)
+        self.cache.put(key, result)
+        return result
+
+    def search(self, address):
+        key = normalize_address(address)
+        found, result = self.cache.get(key)
+        if found:
+            return result
+        future = self.queue.submit(key, with_city(address))
+        try:
+            return clone_json(future.result(timeout=self.wait_timeout))
+        except (CircuitOpenError, FutureTimeout) as e:
+            raise GeocodingUnavailable(str(e) or 'fila de geocodificação demorou demais') from e
+        except (requests.RequestException, HttpError) as e:
+            # sem conexão, timeout ou erro HTTP depois das repetições: a cadeia tenta o próximo
+            raise GeocodingUnavailable(f"nominatim: {type(e).__name__}") from e
+
+    def stats(self):
+        return dict(self.cache.stats(), queued=self.queue.pending(), coalesced=self.queue.coalesced)
+
+
+class ChainGeocoder(GeocoderBackend):
+    """
+    Tenta os geocodificadores em ordem e devolve o primeiro resultado, com
+    'source' indicando quem respondeu e 'precision' ('exact'). Se nenhum
+    encontrou, tenta `approximate` de cada um ('precision': 'approximate');
+    sem nem isso, levanta GeocodingUnavailable se algum estava indisponível.
+    """
+    name = 'chain'
+
+    def __init__(self, backends):
+        self.backends = backends
+
+    def search(self, address):
+        unavailable = None
+        for backend in self.backends:
+            try:
+                result = backend.search(address)
+            except GeocodingUnavailable as e:
+                unavailable = e
+                continue
+            if result is not None:
+                return dict(result, source=backend.name, precision='exact')
+        for backend in self.backends:
+            result = backend.approximate(address)
+            if result is not None:
+                return dict(result, source=backend.name, precision='approximate')
+        if unavailable is not None:
+            raise unavailable
+        return None
+
+    def stats(self):
+        return {backend.name: backend.stats() for backend in self.backends}
+
+
+def create_geocoder(config, client):
+    """Monta a cadeia de geocodificadores listada em config['GEOCODERS']."""
+    backends = []
+    for name in config['GEOCODERS']:
+        if name == 'gazetteer':
+            backends.append(GazetteerGeocoder(config['GAZETTEER_CSV']))
+        elif name == 'nominatim':
+            url = config['NOMINATIM_URL']
+            backends.append(NominatimGeocoder(lambda query: nominatim_search(client, query, url),
+                                              config['GEOCODE_CACHE_JSON'],
+                                              ttl=config['GEOCODE_CACHE_TTL'],
+                                              negative_ttl=config['GEOCODE_NEGATIVE_TTL'],
+                                              min_interval=config['GEOCODE_MIN_INTERVAL']))
+        else:
+            raise ValueError(f"Geocodificador desconhecido: {name}")
+    return ChainGeocoder(backends)
+
+
+def geocode(address):
+    """
+    Geocodifica um endereço da cidade. Levanta GeocodingUnavailable se
+    nenhum geocodificador encontrou e o Nominatim estava fora do ar.
+    """
+    return current_app.extensions['geocoder'].search(address)
@@ -0,0 +1,174 @@
+"""
+Cliente HTTP compartilhado para as chamadas a serviços externos
+(provedores de notícias, Nominatim).
+
+- Uma única `requests.Session` por worker: conexões keep-alive reaproveitadas
+  (pool por host).
+- Falhas transitórias (erro de conexão, timeout, 429 e 5xx) são repetidas até
+  `retries` vezes, com espera exponencial e jitter.
+- Cada provedor tem um circuit breaker: depois de `failure_threshold`
+  falhas seguidas o circuito abre e as chamadas falham na hora
+  (`CircuitOpenError`) por `reset_timeout` segundos; então uma chamada de
+  teste decide se fecha de novo.
+- Chamadas, erros, repetições, chamadas barradas e latência por provedor
+  ficam em `stats()`.
+"""
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """O provedor está com o circuito aberto: a chamada nem foi feita."""
+
+
+class HttpError(Exception):
+    """Resposta com status de erro depois das repetições."""
+    def __init__(self, status, body=None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.body = body
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Se a chamada pode ser feita. Meio aberto: só uma chamada de teste por vez."""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                # abre (ou reabre, se a chamada de teste falhou)
+                self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    def __init__(self, timeout=5.0, retries=2, backoff=0.2, failure_threshold=5, reset_timeout=30.0,
+                 pool_maxsize=10, user_agent=None):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if user_agent:
+            self.session.headers['User-Agent'] = user_agent
+        self._breakers = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _provider(self, name):
+        with self._lock:
+            if name not in self._breakers:
+                self._breakers[name] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+                self._stats[name] = {'calls': 0, 'errors': 0, 'retries': 0, 'short_circuits': 0,
+                                     'total_ms': 0.0, 'last_ms': None}
+            return self._breakers[name], self._stats[name]
+
+    def _sleep_before_retry(self, attempt):
+        # espera exponencial com "full jitter": aleatório entre 0 e backoff * 2^tentativa
+        time.sleep(random.uniform(0, self.backoff * (2 ** attempt)))
+
+    def get(self, provider, url, params=None, headers=None, timeout=None, retries=None):
+        """
+        GET com repetições e circuit breaker do `provider`. `retries` substitui
+        o padrão do cliente (0 para quem tem prazo curto, ex.: notícias).
+        Retorna a Response (status < 400); levanta CircuitOpenError, HttpError
+        ou a exceção do requests da última tentativa.
+        """
+        breaker, stats = self._provider(provider)
+        if not breaker.allow():
+            with self._lock:
+                stats['short_circuits'] += 1
+            raise CircuitOpenError(f"{provider}: circuito aberto")
+
+        start = time.monotonic()
+        attempt = 0
+        retries = self.retries if retries is None else retries
+        try:
+            while True:
+                try:
+                    response = self.session.get(url, params=params, headers=headers,
+                                                timeout=timeout or self.timeout)
+                    if response.status_code not in RETRY_STATUS or attempt >= retries:
+                        break
+                except (requests.ConnectionError, requests.Timeout):
+                    if attempt >= retries:
+                        raise
+                attempt += 1
+                with self._lock:
+                    stats['retries'] += 1
+                self._sleep_before_retry(attempt - 1)
+            if response.status_code >= 400:
+                raise HttpError(response.status_code, response.text[:500])
+        except Exception as e:
+            # 4xx (exceto 429) é erro de quem chamou, não do provedor
+            failed = not (isinstance(e, HttpError) and e.status < 500 and e.status != 429)
+            self._record(provider, breaker, stats, start, failed, error=True)
+            raise
+        self._record(provider, breaker, stats, start, failed=False, error=False)
+        return response
+
+    def get_json(self, provider, url, params=None, headers=None, timeout=None, retries=None):
+        return self.get(provider, url, params=params, headers=headers, timeout=timeout, retries=retries).json()
+
+    def _record(self, provider, breaker, stats, start, failed, error):
+        elapsed = (time.monotonic() - start) * 1000
+        if failed:
+            breaker.failure()
+        else:
+            breaker.success()
+        with self._lock:
+            stats['calls'] += 1
+            stats['errors'] += error
+            stats['total_ms'] += elapsed
+            stats['last_ms'] = round(elapsed, 1)
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {'calls': s['calls'], 'errors': s['errors'], 'retries': s['retries'],
+                       'short_circuits': s['short_circuits'], 'last_ms': s['last_ms'],
+                       'avg_ms': round(s['total_ms'] / s['calls'], 1) if s['calls'] else None,
+                       'circuit': self._breakers[name].state}
+                for name, s in self._stats.items()
+            }
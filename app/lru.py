@@ -0,0 +1,60 @@
+"""
+Cache LRU com versão por entrada, usado pelos caches por worker (documentos
+JSON em utils_csv, páginas e cards em app.cache, usuário logado em
+app.current_user).
+"""
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Cache LRU com versão por entrada: `get` só devolve o valor se a versão
+    guardada for a informada (assinatura do arquivo, versão dos dados...).
+    Conta acertos e falhas.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version=None):
+        """Retorna o valor em cache se a versão ainda bater, senão None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key):
+        """Retorna (versão, valor) da entrada atual, sem validar nem contar acesso."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, value, version=None):
+        """Guarda um valor, descartando o menos usado se passar do limite."""
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Remove uma entrada do cache (ou todas, se key for None)."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self):
+        return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                'hits': self.hits, 'misses': self.misses}
@@ -1,10 +1,10 @@
 from flask import render_template, g, session, current_app, request, jsonify, flash, redirect, url_for
-from ..utils_csv import read_json, ensure_json_file
-from ..auth.routes import is_banned
+from ..storage import get_store
+from ..feed import post_views, recent_page
+from ..cache import cached_page, conditional_get
+from ..news import compose_query
 from . import bp
-import os
-import requests
-from geopy.geocoders import Nominatim
+from ..geocoding import geocode, GeocodingUnavailable
 
 # Inicializa o Blueprint para as páginas principais da aplicação
 # bp = Blueprint('main', __name__)
@@ -14,29 +14,22 @@ def check_ban_and_load_user():
     """
     Executado antes de cada requisição na aplicação.
     - Carrega o usuário logado na variável global 'g.current_user'.
-    - Verifica se o usuário está banido (consultando banned.csv).
-    - Garante que os arquivos de dados (JSON e CSV) existam.
+    - Verifica se o usuário está banido (registro de banidos em memória).
     Se o usuário estiver banido ou não encontrado, limpa a sessão.
+    Os arquivos de dados são criados uma vez em create_app, não aqui.
+    O resultado fica em cache por worker enquanto usuários e banimentos
+    não mudarem (ver app.current_user).
     """
     g.current_user = None
-
-    # Garante arquivos existentes
-    ensure_json_file(current_app.config['USERS_JSON'])
-    ensure_json_file(current_app.config['POSTS_JSON'])
-    ensure_json_file(current_app.config['COMMENTS_JSON'])
-    banned_csv = current_app.config['BANNED_CSV']
-    os.makedirs(os.path.dirname(banned_csv), exist_ok=True)
-    if not os.path.exists(banned_csv):
-        with open(banned_csv, 'w', newline='', encoding='utf-8') as f:
-            f.write('email,ban_reason,ban_at\n')
+    if request.endpoint == 'static':
+        return
 
     if 'user_id' in session:
-        users = read_json(current_app.config['USERS_JSON'])
-        user_id = session['user_id']
-        me = next((u for u in users if u['id'] == user_id), None)
+        cache = current_app.extensions['current_user_cache']
+        me, banned = cache.resolve(get_store(), session['user_id'])
 
         if me:
-            if is_banned(me['email']):
+            if banned:
                 session.clear()
             else:
                 g.current_user = me
@@ -48,264 +41,76 @@ def check_ban_and_load_user():
 def news():
     """
     Rota de Notícias.
-    Busca notícias sobre meio ambiente na API newsdata.io e NewsAPI.org.
+    Busca notícias sobre meio ambiente na API newsdata.io e NewsAPI.org
+    (em paralelo e com cache por consulta, ver app.news).
     """
-    articles = []
     error = None
     # termo de busca vindo do header quando na aba de notícias
     q_param = (request.args.get('q') or '').strip()
-    
-    keywords = [
-        "desmatamento",
-        "poluição",
-        "queimadas",
-        "aquecimento global",
-        "mudanças climáticas",
-        "crise hídrica",
-        "desastre ambiental",
-        "garimpo ilegal",
-        "vazamento de óleo",
-        "extinção"
-    ]
-    
-    # Monta query: usa o termo do usuário se fornecido; senão, usa palavras-chave padrão
-    if q_param:
-        composed_query = q_param
-    else:
-        composed_query = " OR ".join([f'"{k}"' for k in keywords])
 
-    # --- 1. Fetch from NewsData.io ---
-    nd_api_key = current_app.config.get('NEWSDATA_API_KEY')
-    if nd_api_key and not nd_api_key.startswith('pub_62696790'):
-        try:
-            url = "https://newsdata.io/api/1/latest"
-            params = {
-                'apikey': nd_api_key,
-                'q': composed_query,
-                # 'country': 'br', # Removed to allow worldwide news
-                'language': 'pt',
-                'category': 'environment',
-                # 'timezone': 'America/Sao_Paulo', # Removed to allow worldwide news
-                'image': 1,
-                'video': 0,
-                'size': 10 # Max for free plan is usually 10
-            }
-            response = requests.get(url, params=params, timeout=5)
-            data = response.json()
-            if response.status_code == 200 and data.get('status') == 'success':
-                articles.extend(data.get('results', []))
-            else:
-                print(f"NewsData Error: {data}")
-        except Exception as e:
-            print(f"NewsData Request Error: {e}")
-
-    # --- 2. Fetch from NewsAPI.org ---
-    na_api_key = current_app.config.get('NEWSAPI_KEY')
-    if na_api_key and na_api_key != 'YOUR_NEWSAPI_KEY':
-        try:
-            url = "https://newsapi.org/v2/everything"
-            params = {
-                'apiKey': na_api_key,
-                'q': composed_query,
-                'language': 'pt',
-                'sortBy': 'publishedAt',
-                'pageSize': 40
-            }
-            response = requests.get(url, params=params, timeout=5)
-            data = response.json()
-            if response.status_code == 200 and data.get('status') == 'ok':
-                # Normalize data to match NewsData format
-                for item in data.get('articles', []):
-                    articles.append({
-                        'title': item.get('title'),
-                        'link': item.get('url'),
-                        'image_url': item.get('urlToImage'),
-                        'source_id': item.get('source', {}).get('name'),
-                        'pubDate': item.get('publishedAt'),
-                        'description': item.get('description')
-                    })
-            else:
-                print(f"NewsAPI Error: {data}")
-        except Exception as e:
-            print(f"NewsAPI Request Error: {e}")
-
-    # Remove duplicates based on title
-    seen_titles = set()
-    unique_articles = []
-    for art in articles:
-        if art.get('title') and art['title'] not in seen_titles:
-            seen_titles.add(art['title'])
-            unique_articles.append(art)
-    
-    if not unique_articles:
+    articles = current_app.extensions['news'].get(compose_query(q_param))
+    if not articles:
         error = "Não foi possível carregar as notícias no momento."
 
-    return render_template('news.html', articles=unique_articles, error=error)
+    return render_template('news.html', articles=articles, error=error)
 
 
 @bp.route('/')
+@conditional_get('users', 'posts', 'comments', 'likes')
+@cached_page('users', 'posts', 'comments', 'likes')
 def index():
     """
     Rota da página inicial (Home).
-    - Carrega usuários e postagens dos arquivos JSON.
-    - Ordena as postagens da mais recente para a mais antiga.
+    - Carrega uma página de postagens, da mais recente para a mais antiga
+      (a página seguinte vem pelo parâmetro `cursor`).
     - Enriquece os dados das postagens com informações do autor (apelido, imagem).
     - Renderiza o template index.html.
     """
-    users = read_json(current_app.config['USERS_JSON'])
-    posts = read_json(current_app.config['POSTS_JSON'])
-    comments = read_json(current_app.config['COMMENTS_JSON'])
-    
-    # Pre-calcula contagem de comentários
-    comment_counts = {}
-    for c in comments:
-        pid = c.get('post_id')
-        if pid:
-            comment_counts[pid] = comment_counts.get(pid, 0) + 1
-
-    # ordena por created_at string (já no formato HH:MM:SS YYYY-MM-DD) em ordem decrescente
-    posts.sort(key=lambda p: p.get('created_at',''), reverse=True)
-
-    current_user_id = session.get('user_id')
-
-    for p in posts:
-        author = next((u for u in users if u['id'] == p.get('author_id')), None)
-        p['author_nick'] = author['nickname'] if author else 'Anônimo'
-        p['author_image'] = author['profile_image'].replace('\\','/') if author and author.get('profile_image') else ''
-        
-        # Atualiza contagem de comentários dinamicamente
-        p['comments_count'] = comment_counts.get(p['id'], 0)
-
-        # Garante que a lista de likes exista
-        if 'likes' not in p:
-            p['likes'] = []
-            
-        # Verifica se o usuário atual curtiu o post
-        p['user_liked'] = current_user_id in p['likes'] if current_user_id else False
+    store = get_store()
+    cursor = request.args.get('cursor')
+    page, next_cursor = recent_page(store, cursor, current_app.config['FEED_PAGE_SIZE'])
 
-        # Normaliza image_path para usar / em vez de \
-        if p.get('image_path'):
-            p['image_path'] = p['image_path'].replace('\\', '/')
+    # Junta autores, contagens e curtidas do usuário atual só para a página exibida
+    posts = post_views(store, page, current_user_id=session.get('user_id'))
 
-    return render_template('index.html', posts=posts, current_user=g.current_user)
+    return render_template('index.html', posts=posts, current_user=g.current_user,
+                           next_cursor=next_cursor, feed_url=url_for('posts.feed'),
+                           more_url=url_for('main.index', cursor=next_cursor) if next_cursor else None)
 
 
 @bp.route('/waste-info')
+@conditional_get('users', 'points')
+@cached_page('users', 'points')
 def waste_info():
     """
     Rota para a página de informações sobre resíduos.
-    - Define uma lista de resíduos com informações (título, imagem, descrição, locais de coleta).
+    - Usa a lista de resíduos (título, ícone, descrição, quantidade de locais de coleta) do catálogo.
     - Renderiza o template waste_info.html passando essa lista.
     """
-    # Carrega pontos de coleta do JSON
-    ensure_json_file(current_app.config['COLLECTION_POINTS_JSON'])
-    all_points = read_json(current_app.config['COLLECTION_POINTS_JSON'])
-    
-    # Agrupa pontos por tipo
-    points_by_type = {}
-    for p in all_points:
-        t = p.get('type')
-        if t not in points_by_type:
-            points_by_type[t] = []
-        points_by_type[t].append(p)
-
-    # Dados base dos tipos de resíduos
-    # Imagens placeholder usadas caso não existam locais
-    wastes = [
-        {
-            'id': 'pilhas',
-            'title': 'Pilhas e baterias',
-            'icon': 'fa-battery-full',
-            'color': '#f39c12',
-            'desc': 'Leve até pontos de coleta autorizados. Nunca descarte em lixo comum.',
-            'locations': points_by_type.get('pilhas', [])
-        },
-        {
-            'id': 'oleo',
-            'title': 'Óleo de cozinha',
-            'icon': 'fa-bottle-droplet',
-            'color': '#f1c40f',
-            'desc': 'Armazene em garrafa plástica e entregue em pontos de coleta.',
-            'locations': points_by_type.get('oleo', [])
-        },
-        {
-            'id': 'eletronico',
-            'title': 'Lixo Eletrônico',
-            'icon': 'fa-plug',
-            'color': '#7f8c8d',
-            'desc': 'Computadores, celulares e cabos devem ser reciclados separadamente.',
-            'locations': points_by_type.get('eletronico', [])
-        },
-        {
-            'id': 'plastico',
-            'title': 'Plástico',
-            'icon': 'fa-bottle-water',
-            'color': '#e74c3c',
-            'desc': 'Lave as embalagens antes de descartar na coleta seletiva.',
-            'locations': points_by_type.get('plastico', [])
-        },
-        {
-            'id': 'vidro',
-            'title': 'Vidro',
-            'icon': 'fa-wine-bottle',
-            'color': '#27ae60',
-            'desc': 'Separe vidros quebrados em caixas de papelão para evitar acidentes.',
-            'locations': points_by_type.get('vidro', [])
-        },
-        {
-            'id': 'papel',
-            'title': 'Papel',
-            'icon': 'fa-newspaper',
-            'color': '#3498db',
-            'desc': 'Papéis secos e limpos podem ser reciclados. Evite amassar.',
-            'locations': points_by_type.get('papel', [])
-        },
-        {
-            'id': 'metal',
-            'title': 'Metal',
-            'icon': 'fa-gears',
-            'color': '#e67e22',
-            'desc': 'Latas de alumínio e aço são 100% recicláveis.',
-            'locations': points_by_type.get('metal', [])
-        }
-    ]
-    
-    return render_template('waste_info.html', wastes=wastes)
+    # Catálogo pré-calculado quando os pontos mudam (app.waste_catalog): só a
+    # quantidade de pontos por tipo vai na página; os locais próximos vêm de
+    # /collection-points/nearby depois da busca ou do GPS
+    catalog = current_app.extensions['waste_catalog'].get(get_store())
+    return render_template('waste_info.html', wastes=catalog.wastes,
+                           geojson_url=url_for('main.collection_points_geojson', v=catalog.etag))
 
 
 @bp.route('/user/@<nickname>')
+@conditional_get('users', 'posts', 'comments', 'likes')
+@cached_page('users', 'posts', 'comments', 'likes')
 def view_user_profile_by_nickname(nickname):
     """
     Exibe o perfil público usando o nickname (handle).
     """
-    users = read_json(current_app.config['USERS_JSON'])
-    target = next((u for u in users if u.get('nickname','').lower() == (nickname or '').lower()), None)
+    store = get_store()
+    target = store.users.by_nickname(nickname)
     if not target:
         flash('Usuário não encontrado', 'error')
         return redirect(url_for('main.index'))
 
-    posts = read_json(current_app.config['POSTS_JSON'])
-    comments = read_json(current_app.config['COMMENTS_JSON'])
-
-    # contagem de comentários por post
-    comment_counts = {}
-    for c in comments:
-        pid = c.get('post_id')
-        if pid:
-            comment_counts[pid] = comment_counts.get(pid, 0) + 1
-
-    user_posts = [p for p in posts if p.get('author_id') == target.get('id')]
-    # ordena do mais recente
-    user_posts.sort(key=lambda p: p.get('created_at', ''), reverse=True)
-
-    for p in user_posts:
-        p['author_nick'] = target['nickname']
-        p['author_image'] = target.get('profile_image', '').replace('\\','/') if target.get('profile_image') else ''
-        p['comments_count'] = comment_counts.get(p['id'], 0)
-        if 'likes' not in p:
-            p['likes'] = []
-        if p.get('image_path'):
-            p['image_path'] = p['image_path'].replace('\\', '/')
+    # do mais recente para o mais antigo, direto do índice de recência
+    user_posts = store.posts.recent(author_id=target.get('id'))
+    user_posts = post_views(store, user_posts, current_user_id=session.get('user_id'))
 
     is_owner = session.get('user_id') == target.get('id')
     # prepara joined_date
@@ -335,8 +140,7 @@ def view_user_profile(user_id):
     """
     Compatibilidade com URLs antigas por ID: redireciona para /user/@nickname.
     """
-    users = read_json(current_app.config['USERS_JSON'])
-    target = next((u for u in users if u['id'] == user_id), None)
+    target = get_store().users.get(user_id)
     if not target:
         flash('Usuário não encontrado', 'error')
         return redirect(url_for('main.index'))
@@ -351,18 +155,73 @@ def geocode_address():
         return jsonify({'error': 'Endereço não fornecido'}), 400
         
     try:
-        geolocator = Nominatim(user_agent="projeto_pweb_waste_app")
-        # Adiciona contexto para melhorar a busca
-        location = geolocator.geocode(f"{address}, João Pessoa, PB, Brasil")
+        location = geocode(address)
         
         if location:
-            return jsonify({
-                'lat': location.latitude,
-                'lon': location.longitude,
-                'display_name': location.address
-            })
+            return jsonify(location)
         else:
             return jsonify({'error': 'Endereço não encontrado'}), 404
             
+    except GeocodingUnavailable:
+        # Nominatim fora do ar: falha na hora em vez de esperar o timeout
+        return jsonify({'error': 'Serviço de mapas indisponível, tente novamente em instantes'}), 503
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        # detalhes (URL do serviço, conexão) só no log
+        print(f"Erro ao geocodificar: {e!r}")
+        return jsonify({'error': 'Erro ao buscar endereço'}), 500
+
+@bp.route('/collection-points/nearby')
+@conditional_get('points')
+def nearby_collection_points():
+    """
+    Pontos de coleta perto de (lat, lon), do mais perto ao mais longe.
+    - `radius` (km): todos os pontos dentro do raio (até NEARBY_MAX_RESULTS);
+    - `k`: só os k mais próximos (com `radius`, os k mais próximos dentro do raio);
+    - `type`: só pontos desse tipo de resíduo.
+    Sem `radius` nem `k`, retorna os 10 mais próximos. Usa o índice espacial
+    do worker (app.spatial), remontado quando os pontos mudam.
+    """
+    try:
+        lat = float(request.args['lat'])
+        lon = float(request.args['lon'])
+        radius = float(request.args['radius']) if request.args.get('radius') else None
+        k = int(request.args['k']) if request.args.get('k') else None
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Parâmetros inválidos: informe lat, lon e, opcionalmente, radius (km) e k'}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({'error': 'Coordenadas fora do intervalo'}), 400
+
+    max_results = current_app.config['NEARBY_MAX_RESULTS']
+    max_radius = current_app.config['NEARBY_MAX_RADIUS_KM']
+    if radius is not None and not 0 < radius <= max_radius:
+        return jsonify({'error': f'O raio deve estar entre 0 e {max_radius:g} km'}), 400
+    if k is not None and not 0 < k <= max_results:
+        return jsonify({'error': f'k deve estar entre 1 e {max_results}'}), 400
+    point_type = request.args.get('type') or None
+
+    index = current_app.extensions['point_index'].get(get_store())
+    if radius is None:
+        found = index.nearest(lat, lon, k or 10, point_type)
+    else:
+        found = index.within(lat, lon, radius, point_type, limit=k or max_results)
+
+    points = [dict(p, distance_km=round(km, 3)) for km, p in found]
+    return jsonify({'points': points, 'count': len(points)})
+
+
+@bp.route('/collection-points.geojson')
+def collection_points_geojson():
+    """
+    Pontos de coleta como FeatureCollection GeoJSON (para mapas), servida
+    do catálogo pré-calculado. ETag é o hash do conteúdo; com `v` igual ao
+    ETag atual (URL usada pela página) a resposta pode ficar em cache por
+    um ano, já que qualquer mudança nos pontos muda a URL.
+    """
+    catalog = current_app.extensions['waste_catalog'].get(get_store())
+    response = current_app.response_class(catalog.geojson, mimetype='application/geo+json')
+    response.set_etag(catalog.etag)
+    if request.args.get('v') == catalog.etag:
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
@@ -0,0 +1,213 @@
+"""
+Notícias ambientais agregadas de NewsData.io e NewsAPI.org.
+
+Os provedores são consultados ao mesmo tempo (ThreadPoolExecutor, com
+threads para `max_inflight` consultas simultâneas) dentro de um prazo de
+`timeout` segundos por consulta: cada chamada recebe só o tempo que resta
+até o prazo, sem repetições, e o que nem começou quando o prazo acaba é
+cancelado. O resultado combinado, sem títulos repetidos, fica em cache
+por consulta:
+- até `ttl` segundos a resposta é servida direto do cache;
+- depois disso, e por mais `max_stale` segundos, a cópia velha continua
+  sendo servida enquanto uma thread em segundo plano busca a nova;
+- várias requisições da mesma consulta sem cache esperam a mesma busca.
+As requisições passam pelo cliente compartilhado (app.http_client), com
+conexões reaproveitadas e circuit breaker por provedor; chamadas, erros
+e latência de cada provedor ficam nas estatísticas dele.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+KEYWORDS = [
+    "desmatamento",
+    "poluição",
+    "queimadas",
+    "aquecimento global",
+    "mudanças climáticas",
+    "crise hídrica",
+    "desastre ambiental",
+    "garimpo ilegal",
+    "vazamento de óleo",
+    "extinção"
+]
+
+
+def compose_query(q):
+    """Usa o termo do usuário se fornecido; senão, as palavras-chave padrão."""
+    q = (q or '').strip()
+    return q if q else " OR ".join([f'"{k}"' for k in KEYWORDS])
+
+
+def fetch_newsdata(client, api_key, query, timeout=5, url="https://newsdata.io/api/1/latest"):
+    params = {
+        'apikey': api_key,
+        'q': query,
+        # 'country': 'br', # Removed to allow worldwide news
+        'language': 'pt',
+        'category': 'environment',
+        # 'timezone': 'America/Sao_Paulo', # Removed to allow worldwide news
+        'image': 1,
+        'video': 0,
+        'size': 10 # Max for free plan is usually 10
+    }
+    data = client.get_json('newsdata', url, params=params, timeout=timeout, retries=0)
+    if data.get('status') != 'success':
+        raise RuntimeError(f"NewsData Error: {data}")
+    return data.get('results', [])
+
+
+def fetch_newsapi(client, api_key, query, timeout=5, url="https://newsapi.org/v2/everything"):
+    params = {
+        'apiKey': api_key,
+        'q': query,
+        'language': 'pt',
+        'sortBy': 'publishedAt',
+        'pageSize': 40
+    }
+    data = client.get_json('newsapi', url, params=params, timeout=timeout, retries=0)
+    if data.get('status') != 'ok':
+        raise RuntimeError(f"NewsAPI Error: {data}")
+    # Normalize data to match NewsData format
+    return [{
+        'title': item.get('title'),
+        'link': item.get('url'),
+        'image_url': item.get('urlToImage'),
+        'source_id': item.get('source', {}).get('name'),
+        'pubDate': item.get('publishedAt'),
+        'description': item.get('description')
+    } for item in data.get('articles', [])]
+
+
+def configured_providers(config, client):
+    """[(nome, função(query, timeout))] dos provedores com chave configurada, na ordem de exibição."""
+    providers = []
+    nd_api_key = config.get('NEWSDATA_API_KEY')
+    if nd_api_key and not nd_api_key.startswith('pub_62696790'):
+        nd_url = config['NEWSDATA_URL']
+        providers.append(('newsdata', lambda q, timeout: fetch_newsdata(client, nd_api_key, q, timeout, nd_url)))
+    na_api_key = config.get('NEWSAPI_KEY')
+    if na_api_key and na_api_key != 'YOUR_NEWSAPI_KEY':
+        na_url = config['NEWSAPI_URL']
+        providers.append(('newsapi', lambda q, timeout: fetch_newsapi(client, na_api_key, q, timeout, na_url)))
+    return providers
+
+
+def dedupe(articles):
+    """Remove duplicates based on title"""
+    seen_titles = set()
+    unique_articles = []
+    for art in articles:
+        if art.get('title') and art['title'] not in seen_titles:
+            seen_titles.add(art['title'])
+            unique_articles.append(art)
+    return unique_articles
+
+
+class NewsAggregator:
+    def __init__(self, providers, ttl=600, max_stale=3600, timeout=5, max_entries=64, max_inflight=8):
+        self.providers = providers
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.cancelled_calls = 0
+        self._entries = OrderedDict()  # query -> (momento da busca, artigos)
+        self._inflight = {}            # query -> Future da busca em andamento
+        self._lock = threading.Lock()
+        # uma thread por provedor para cada consulta simultânea: uma consulta
+        # lenta não deixa as outras esperando na fila do executor
+        self._executor = ThreadPoolExecutor(max_workers=max(1, len(providers) * max_inflight),
+                                            thread_name_prefix='news')
+
+    def get(self, query):
+        """Artigos da consulta (lista vazia se nenhum provedor respondeu)."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None:
+                age = now - entry[0]
+                if age < self.ttl:
+                    self._entries.move_to_end(query)
+                    self.hits += 1
+                    return entry[1]
+                if age < self.ttl + self.max_stale:
+                    self._entries.move_to_end(query)
+                    self.stale_hits += 1
+                    if query not in self._inflight:
+                        self._inflight[query] = Future()
+                        self.refreshes += 1
+                        threading.Thread(target=self._load, args=(query,), daemon=True).start()
+                    return entry[1]
+            self.misses += 1
+            future = self._inflight.get(query)
+            if future is None:
+                future = self._inflight[query] = Future()
+                owner = True
+            else:
+                owner = False
+        if owner:
+            return self._load(query)
+        return future.result()
+
+    def _load(self, query):
+        """Busca nos provedores, guarda no cache e resolve a Future da consulta."""
+        try:
+            articles = self._fetch(query)
+        except Exception as e:
+            print(f"Erro ao buscar notícias: {e}")
+            articles = []
+        with self._lock:
+            if articles:
+                self._entries[query] = (time.monotonic(), articles)
+                self._entries.move_to_end(query)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                # nenhum provedor respondeu: mantém a cópia velha, se houver
+                entry = self._entries.get(query)
+                articles = entry[1] if entry is not None else []
+            future = self._inflight.pop(query, None)
+        if future is not None:
+            future.set_result(articles)
+        return articles
+
+    def _call(self, name, fetch, query, deadline):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return []
+        try:
+            return fetch(query, remaining)
+        except Exception as e:
+            print(f"{name} Request Error: {e}")
+            return []
+
+    def _fetch(self, query):
+        """Consulta todos os provedores em paralelo e junta os resultados na ordem dos provedores."""
+        deadline = time.monotonic() + self.timeout
+        futures = [self._executor.submit(self._call, name, fetch, query, deadline)
+                   for name, fetch in self.providers]
+        # provedor que passar do prazo fica de fora desta resposta
+        wait(futures, timeout=self.timeout)
+        articles = []
+        for f in futures:
+            if f.done():
+                articles.extend(f.result())
+            elif f.cancel():
+                # nem começou: não gasta cota de API com uma resposta que ninguém vai usar
+                with self._lock:
+                    self.cancelled_calls += 1
+        return dedupe(articles)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'stale_hits': self.stale_hits, 'misses': self.misses,
+                    'refreshes': self.refreshes, 'cancelled_calls': self.cancelled_calls,
+                    'hit_rate': round((self.hits + self.stale_hits) / lookups, 3) if lookups else None}
@@ -0,0 +1,313 @@
+"""
+Importação em lote de pontos de coleta (CSV ou GeoJSON).
+
+1. O arquivo é lido registro a registro (csv.DictReader; no GeoJSON, as
+   features da FeatureCollection); linhas inválidas são contadas e as
+   primeiras vão para `errors`.
+2. Pontos repetidos, no arquivo ou já cadastrados, são descartados: mesmo
+   nome e endereço normalizados, ou mesmo tipo nas mesmas coordenadas.
+3. Os endereços sem coordenadas são geocodificados em segundo plano, cada
+   endereço distinto uma vez, em lotes de `batch_size` pela cadeia de
+   geocodificadores (o Nominatim já respeita o intervalo mínimo e o cache).
+4. Todos os pontos novos são gravados numa única escrita
+   (`points.add_many`).
+O andamento de cada importação (`ImportJob.progress()`) é gravado em
+`status_path` a cada etapa, então qualquer worker consegue informá-lo.
+"""
+import csv
+import io
+import itertools
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .geocoding import GeocodingUnavailable, normalize_address
+from .search import fold
+from .spatial import point_coords
+from .utils_csv import read_json, update_json
+from .waste_catalog import POINT_TYPES
+
+# Nomes de coluna / propriedade aceitos (sem acentos, minúsculas) -> campo do ponto
+_FIELDS = {
+    'name': 'name', 'nome': 'name',
+    'type': 'type', 'tipo': 'type',
+    'address': 'address', 'endereco': 'address',
+    'street': 'street', 'rua': 'street', 'logradouro': 'street',
+    'number': 'number', 'numero': 'number',
+    'neighborhood': 'neighborhood', 'bairro': 'neighborhood',
+    'lat': 'lat', 'latitude': 'lat',
+    'lon': 'lon', 'lng': 'lon', 'longitude': 'lon',
+}
+
+MAX_ERRORS = 50
+
+
+class PointImportError(ValueError):
+    """Arquivo que não dá para importar (formato desconhecido, JSON inválido...)."""
+
+
+def _normalize_fields(raw):
+    row = {}
+    for key, value in raw.items():
+        field = _FIELDS.get(fold((key or '').strip()))
+        if field and value not in (None, ''):
+            if field not in ('lat', 'lon'):
+                value = str(value)
+            row[field] = value.strip() if isinstance(value, str) else value
+    return row
+
+
+def _csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    header = text.readline()
+    # planilhas em português costumam exportar com ';'
+    delimiter = ';' if header.count(';') > header.count(',') else ','
+    for raw in csv.DictReader(itertools.chain([header], text), delimiter=delimiter):
+        yield _normalize_fields(raw)
+
+
+def _geojson_rows(stream):
+    try:
+        data = json.load(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+    except ValueError as e:
+        raise PointImportError(f"GeoJSON inválido: {e}") from e
+    if not isinstance(data, dict) or data.get('type') != 'FeatureCollection':
+        raise PointImportError("O GeoJSON deve ser uma FeatureCollection")
+    for feature in data.get('features') or []:
+        row = _normalize_fields((feature or {}).get('properties') or {})
+        geometry = (feature or {}).get('geometry') or {}
+        coords = geometry.get('coordinates')
+        if geometry.get('type') == 'Point' and isinstance(coords, list) and len(coords) >= 2:
+            # GeoJSON guarda [longitude, latitude]
+            row['lon'], row['lat'] = coords[0], coords[1]
+        yield row
+
+
+def read_rows(stream, filename=''):
+    """Registros (dicts com os campos normalizados) de um arquivo CSV ou GeoJSON binário."""
+    name = (filename or '').lower()
+    if name.endswith(('.geojson', '.json')):
+        return _geojson_rows(stream)
+    if name.endswith(('.csv', '.txt')):
+        return _csv_rows(stream)
+    raise PointImportError("Formato não suportado: envie um arquivo .csv ou .geojson")
+
+
+def row_to_point(row):
+    """Ponto de coleta do registro, ou levanta ValueError com o motivo."""
+    name = row.get('name')
+    type_ = fold(row.get('type') or '').strip()
+    address = row.get('address')
+    if not address and row.get('street'):
+        address = f"{row['street']}, {row.get('number') or 'S/N'}"
+        if row.get('neighborhood'):
+            address += f" - {row['neighborhood']}"
+    if not name:
+        raise ValueError("sem nome")
+    if type_ not in POINT_TYPES:
+        raise ValueError(f"tipo inválido: {row.get('type')!r}")
+    coords = point_coords(row)
+    if coords is None and ('lat' in row or 'lon' in row):
+        raise ValueError("coordenadas inválidas")
+    if coords is None and not address:
+        raise ValueError("sem endereço nem coordenadas")
+    lat, lon = coords if coords is not None else (0.0, 0.0)
+    return {'id': str(uuid.uuid4()), 'name': name, 'type': type_, 'address': address or '',
+            'lat': lat, 'lon': lon}
+
+
+def point_keys(point):
+    """
+    Chaves de duplicidade: nome + endereço normalizados e, com coordenadas,
+    tipo + posição (~1 m). Calculadas antes de geocodificar: endereços não
+    encontrados recebem o centróide do bairro ('precision': 'approximate'),
+    que é o mesmo para pontos diferentes.
+    """
+    keys = []
+    if point.get('address'):
+        keys.append(('name', fold(point.get('name')).strip(), normalize_address(point['address'])))
+    coords = point_coords(point)
+    if coords is not None:
+        keys.append(('coords', point.get('type'), round(coords[0], 5), round(coords[1], 5)))
+    return keys
+
+
+class ImportJob:
+    def __init__(self, source):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.status = 'queued'
+        self.rows = 0
+        self.invalid = 0
+        self.duplicates = 0
+        self.to_geocode = 0
+        self.geocoded = 0
+        self.not_found = 0
+        self.unavailable = 0
+        self.approximate = 0
+        self.added = 0
+        self.errors = []
+        self.error = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.points = []  # [(ponto, chaves de duplicidade)]
+        self._lock = threading.Lock()
+
+    def note_error(self, line, reason):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"linha {line}: {reason}")
+
+    def progress(self):
+        with self._lock:
+            return {'id': self.id, 'source': self.source, 'status': self.status,
+                    'rows': self.rows, 'invalid': self.invalid, 'duplicates': self.duplicates,
+                    'to_geocode': self.to_geocode, 'geocoded': self.geocoded,
+                    'not_found': self.not_found, 'unavailable': self.unavailable,
+                    'approximate': self.approximate,
+                    'added': self.added, 'errors': list(self.errors), 'error': self.error,
+                    'started_at': self.started_at, 'finished_at': self.finished_at}
+
+
+class PointImporter:
+    """
+    Importações de pontos. `start` lê o arquivo na hora e continua em uma
+    thread; `run` faz tudo na thread de quem chamou (CLI).
+    """
+    def __init__(self, store, geocoder, status_path, batch_size=5, max_jobs=20):
+        self.store = store
+        self.geocoder = geocoder
+        self.status_path = status_path
+        self.batch_size = max(1, batch_size)
+        self.max_jobs = max_jobs
+
+    def status(self, job_id):
+        """Andamento da importação `job_id` (dict de ImportJob.progress) ou None."""
+        return next((j for j in read_json(self.status_path, copy=False) if j.get('id') == job_id), None)
+
+    def _save(self, job):
+        progress = job.progress()
+        keep = self.max_jobs - 1
+        update_json(self.status_path,
+                    lambda jobs: [j for j in jobs if j.get('id') != job.id][-keep:] + [progress]
+                    if keep else [progress])
+
+    def _new_job(self, stream, filename):
+        job = ImportJob(filename or 'arquivo')
+        self._parse(job, stream, filename)
+        self._save(job)
+        return job
+
+    def start(self, stream, filename):
+        """Lê e valida o arquivo; geocodificação e gravação seguem em segundo plano."""
+        job = self._new_job(stream, filename)
+        threading.Thread(target=self._process, args=(job,), daemon=True,
+                         name=f'point-import-{job.id[:8]}').start()
+        return job
+
+    def run(self, stream, filename, on_progress=None):
+        """Importação completa, síncrona. `on_progress(job)` é chamado a cada lote geocodificado."""
+        job = self._new_job(stream, filename)
+        self._process(job, on_progress)
+        return job
+
+    def _parse(self, job, stream, filename):
+        seen = set()
+        for point in self.store.points.all():
+            seen.update(point_keys(point))
+        # linha 1 do CSV é o cabeçalho; no GeoJSON, "linha" é a posição da feature
+        offset = 1 if not (filename or '').lower().endswith(('.geojson', '.json')) else 0
+        for n, row in enumerate(read_rows(stream, filename), start=1):
+            job.rows += 1
+            try:
+                point = row_to_point(row)
+            except ValueError as e:
+                job.note_error(n + offset, e)
+                continue
+            keys = point_keys(point)
+            if any(key in seen for key in keys):
+                job.duplicates += 1
+                continue
+            seen.update(keys)
+            job.points.append((point, keys))
+
+    def _geocode(self, job, on_progress=None):
+        pending = OrderedDict()
+        for point, _ in job.points:
+            if point_coords(point) is None:
+                pending.setdefault(normalize_address(point['address']), []).append(point)
+        job.to_geocode = sum(len(points) for points in pending.values())
+        if not pending:
+            return
+
+        def search(address):
+            # qualquer falha fica só neste endereço: o resto do lote segue
+            try:
+                return self.geocoder.search(address), False
+            except GeocodingUnavailable:
+                return None, True
+            except Exception as e:
+                print(f"Erro ao geocodificar na importação: {e!r}")
+                return None, True
+
+        keys = list(pending)
+        with ThreadPoolExecutor(max_workers=self.batch_size, thread_name_prefix='point-geocode') as executor:
+            for start in range(0, len(keys), self.batch_size):
+                batch = keys[start:start + self.batch_size]
+                results = executor.map(search, [pending[key][0]['address'] for key in batch])
+                for key, (location, unavailable) in zip(batch, results):
+                    points = pending[key]
+                    with job._lock:
+                        if location:
+                            for point in points:
+                                point['lat'], point['lon'] = location['lat'], location['lon']
+                                if location.get('precision'):
+                                    point['precision'] = location['precision']
+                            job.geocoded += len(points)
+                            if location.get('precision') == 'approximate':
+                                job.approximate += len(points)
+                        elif unavailable:
+                            job.unavailable += len(points)
+                        else:
+                            job.not_found += len(points)
+                self._save(job)
+                if on_progress:
+                    on_progress(job)
+
+    def _process(self, job, on_progress=None):
+        job.status = 'geocoding'
+        try:
+            self._geocode(job, on_progress)
+        except Exception as e:
+            # os pontos com coordenadas (do arquivo ou já geocodificados) são gravados mesmo assim
+            print(f"Erro na geocodificação da importação {job.id}: {e!r}")
+            job.error = 'A geocodificação foi interrompida; parte dos pontos ficou sem localização'
+        try:
+            job.status = 'saving'
+            self._save(job)
+            # descarta o que outra importação/admin cadastrou enquanto geocodificava
+            seen = set()
+            for point in self.store.points.all():
+                seen.update(point_keys(point))
+            new_points = []
+            for point, keys in job.points:
+                if any(key in seen for key in keys):
+                    job.duplicates += 1
+                    continue
+                seen.update(keys)
+                new_points.append(point)
+            self.store.points.add_many(new_points)
+            job.added = len(new_points)
+            job.status = 'done'
+        except Exception as e:
+            # detalhes (caminhos, conexões) só no log; o status é visto pelo painel
+            print(f"Erro ao gravar a importação {job.id}: {e!r}")
+            job.status = 'failed'
+            job.error = 'Erro ao gravar os pontos importados'
+        finally:
+            job.points = []
+            job.finished_at = time.time()
+            self._save(job)
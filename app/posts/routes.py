@@ -1,11 +1,19 @@
 from flask import request, render_template, redirect, url_for, flash, current_app, session, jsonify, g
-from ..utils_csv import read_json, append_json, ensure_json_file, write_json
-import uuid, datetime, os
+from ..storage import get_store
+from ..feed import author_map, post_views, comment_views, post_activity, recent_page, search_page
+from ..timestamps import now_fields
+from ..cache import cached_page, conditional_get
+from ..search import parse_tags, normalize_tag
+import uuid, os
+from dataclasses import asdict
 from werkzeug.utils import secure_filename
 from . import bp
 
 # bp = Blueprint('posts', __name__)
 
+# Máximo de posts por chamada a /posts/activity (uma página do feed com folga)
+ACTIVITY_MAX_POSTS = 100
+
 def login_required():
     """
     Verifica se o usuário está logado (se 'user_id' está na sessão).
@@ -13,15 +21,6 @@ def login_required():
     """
     return 'user_id' in session
 
-@bp.before_request
-def ensure_files():
-    """
-    Executado antes de cada requisição neste Blueprint.
-    Garante que os arquivos JSON de posts e comentários existam.
-    """
-    ensure_json_file(current_app.config['POSTS_JSON'])
-    ensure_json_file(current_app.config['COMMENTS_JSON'])
-
 @bp.route('/create', methods=['GET','POST'])
 def create_post():
     """
@@ -55,25 +54,25 @@ def create_post():
             # Use forward slash para URLs
             imgpath = f"uploads/{session['user_id']}/posts/{newname}"
         pid = str(uuid.uuid4())
-        # Horário de Brasília (UTC-3)
-        brasilia_tz = datetime.timezone(datetime.timedelta(hours=-3))
-        timestamp = datetime.datetime.now(brasilia_tz).strftime('%H:%M:%S %d/%m/%Y')
         row = {
             'id': pid,
             'author_id': session['user_id'],
             'image_path': imgpath,
             'description': desc,
             'address': address,
-            'created_at': timestamp,
-            'tags': tags
+            **now_fields(),  # created_at (Brasília) e created_ts
+            'tags': tags,
+            'tag_list': parse_tags(tags)
         }
-        append_json(current_app.config['POSTS_JSON'], row)
+        get_store().posts.add(row)
         flash('Denúncia criada. Procure o órgão responsável: Tel: (83) 3214-XXXX / email: meioambiente@joaopessoa.pb.gov.br', 'info')
         return redirect(url_for('posts.view_post', post_id=pid))
     # Se for GET, redireciona para a home onde está o formulário
     return redirect(url_for('main.index'))
 
 @bp.route('/<post_id>', methods=['GET','POST'])
+@conditional_get('users', 'posts', 'comments', 'likes')
+@cached_page('users', 'posts', 'comments', 'likes')
 def view_post(post_id):
     """
     Rota para visualizar uma postagem específica e seus comentários.
@@ -83,28 +82,11 @@ def view_post(post_id):
     - Carrega comentários associados.
     - Processa novo comentário (se POST).
     """
-    posts = read_json(current_app.config['POSTS_JSON'])
-    post = next((p for p in posts if p['id']==post_id), None)
+    store = get_store()
+    post = store.posts.get(post_id)
     if not post:
         flash('Post não encontrado', 'error')
         return redirect(url_for('main.index'))
-    users = read_json(current_app.config['USERS_JSON'])
-    author = next((u for u in users if u['id']==post['author_id']), None)
-    post['author_nick'] = author['nickname'] if author else 'Anônimo'
-    post['author_image'] = author['profile_image'].replace('\\','/') if author and author.get('profile_image') else ''
-    comments = [c for c in read_json(current_app.config['COMMENTS_JSON']) if c['post_id']==post_id]
-    
-    # Prepara dados para o post_card
-    post['comments_count'] = len(comments)
-    if 'likes' not in post:
-        post['likes'] = []
-    if post.get('image_path'):
-        post['image_path'] = post['image_path'].replace('\\', '/')
-
-    for c in comments:
-        u = next((x for x in users if x['id']==c['author_id']), None)
-        c['author_nick'] = u['nickname'] if u else 'Anônimo'
-        c['author_image'] = u['profile_image'].replace('\\','/') if u and u.get('profile_image') else ''
     if request.method == 'POST':
         if not login_required():
             flash('Faça login para comentar', 'error')
@@ -112,81 +94,110 @@ def view_post(post_id):
         text = request.form.get('comment','').strip()
         if text:
             cid = str(uuid.uuid4())
-            # Horário de Brasília (UTC-3)
-            brasilia_tz = datetime.timezone(datetime.timedelta(hours=-3))
-            timestamp = datetime.datetime.now(brasilia_tz).strftime('%H:%M:%S %d/%m/%Y')
             row = {
                 'id': cid,
                 'post_id': post_id,
                 'author_id': session['user_id'],
                 'text': text,
-                'created_at': timestamp
+                **now_fields()
             }
-            append_json(current_app.config['COMMENTS_JSON'], row)
+            store.comments.add(row)
             flash('Comentário adicionado', 'success')
             return redirect(url_for('posts.view_post', post_id=post_id))
+
+    comments = store.comments.by_post(post_id)
+    current_user_id = session.get('user_id')
+    # Prepara dados para o post_card (um único lookup em lote para post e comentários)
+    authors = author_map(store, {post.get('author_id')} | {c.get('author_id') for c in comments})
+    post = post_views(store, [post], current_user_id=current_user_id,
+                      comment_counts={post_id: len(comments)}, authors=authors)[0]
+    comments = comment_views(store, comments, current_user_id=current_user_id,
+                             is_admin=session.get('is_admin', False), authors=authors)
     return render_template('post_view.html', post=post, comments=comments, current_user=g.current_user)
 
+def _feed_page(store, q, tag, cursor, limit):
+    """
+    Página do feed já convertida em PostView, mais o cursor da próxima.
+    Com `q` usa o índice de busca (ordem de relevância); sem `q` lê o
+    índice de recência (geral ou da `tag`).
+    """
+    if q:
+        page, next_cursor = search_page(store, q, cursor, limit, tag=tag)
+    else:
+        page, next_cursor = recent_page(store, cursor, limit, tag=tag or None)
+    views = post_views(store, page, current_user_id=session.get('user_id'))
+    return views, next_cursor
+
 @bp.route('/list')
+@conditional_get('users', 'posts', 'comments', 'likes')
+@cached_page('users', 'posts', 'comments', 'likes')
 def list_posts():
     """
     Rota para listar postagens com filtros (busca e tags).
-    - Filtra postagens por termo de busca (q) ou tag.
-    - Ordena por data (mais recente primeiro).
+    - Busca por termo (q) no índice invertido, ordenada por relevância.
+    - Filtra por tag.
+    - Sem busca, ordena por data (mais recente primeiro).
+    - Uma página por vez (`cursor`).
     - Renderiza index.html com os resultados filtrados.
     """
     q = request.args.get('q','').lower()
-    tag = request.args.get('tag','').lower()
-    posts = read_json(current_app.config['POSTS_JSON'])
-    users = read_json(current_app.config['USERS_JSON'])
-    if q:
-        posts = [p for p in posts if q in (p.get('description','') or '').lower() or q in (p.get('address','') or '').lower() or q in (p.get('tags','') or '').lower()]
-    if tag:
-        posts = [p for p in posts if tag in (p.get('tags','') or '').lower()]
-    posts.sort(key=lambda p: p.get('created_at',''), reverse=True)
-    for p in posts:
-        author = next((u for u in users if u['id']==p['author_id']), None)
-        p['author_nick'] = author['nickname'] if author else 'Anônimo'
-        p['author_image'] = author['profile_image'].replace('\\','/') if author and author.get('profile_image') else ''
-        # Normaliza image_path para usar / em vez de \
-        if p.get('image_path'):
-            p['image_path'] = p['image_path'].replace('\\', '/')
-    return render_template('index.html', posts=posts)
+    tag = normalize_tag(request.args.get('tag',''))
+    posts, next_cursor = _feed_page(get_store(), q, tag, request.args.get('cursor'),
+                                    current_app.config['FEED_PAGE_SIZE'])
+    return render_template('index.html', posts=posts, next_cursor=next_cursor,
+                           feed_url=url_for('posts.feed', q=q or None, tag=tag or None),
+                           more_url=url_for('posts.list_posts', q=q or None, tag=tag or None, cursor=next_cursor) if next_cursor else None)
+
+@bp.route('/feed')
+def feed():
+    """
+    Página seguinte do feed em JSON, usada pela rolagem infinita.
+    Parâmetros: cursor, limit, q e tag (os mesmos filtros de /posts/list).
+    Retorna os dados dos posts, o HTML dos cards e o próximo cursor.
+    """
+    q = request.args.get('q','').lower()
+    tag = normalize_tag(request.args.get('tag',''))
+    page_size = current_app.config['FEED_PAGE_SIZE']
+    limit = request.args.get('limit', page_size, type=int)
+    limit = max(1, min(limit, page_size * 5))
+    posts, next_cursor = _feed_page(get_store(), q, tag, request.args.get('cursor'), limit)
+    html = render_template('components/post_list.html', posts=posts, current_user=g.current_user)
+    return jsonify({
+        'posts': [asdict(p) for p in posts],
+        'html': html,
+        'next_cursor': next_cursor
+    })
+
+@bp.route('/tags/top')
+def top_tags():
+    """
+    Tags mais usadas nas postagens, com a quantidade de cada uma (barra de facetas).
+    Parâmetro: limit (padrão 20).
+    """
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    counts = get_store().posts.tag_counts(limit)
+    return jsonify([{'tag': tag, 'count': n} for tag, n in counts])
 
 @bp.route('/like/<post_id>', methods=['POST'])
 def toggle_like(post_id):
     """
     Rota para curtir/descurtir uma postagem.
     - Verifica login.
-    - Adiciona ou remove o ID do usuário da lista de likes do post.
+    - Adiciona ou remove o ID do usuário das curtidas do post (store.likes).
     - Retorna JSON com o novo número de likes e status.
     """
     if not login_required():
         return jsonify({'error': 'Login required'}), 401
-    
-    user_id = session['user_id']
-    posts = read_json(current_app.config['POSTS_JSON'])
-    
-    post_index = next((i for i, p in enumerate(posts) if p['id'] == post_id), None)
-    if post_index is None:
+
+    store = get_store()
+    if store.posts.get(post_id) is None:
         return jsonify({'error': 'Post not found'}), 404
-    
-    post = posts[post_index]
-    if 'likes' not in post:
-        post['likes'] = []
-        
-    liked = False
-    if user_id in post['likes']:
-        post['likes'].remove(user_id)
-        liked = False
-    else:
-        post['likes'].append(user_id)
-        liked = True
-        
-    write_json(current_app.config['POSTS_JSON'], posts)
-    
+
+    # Só acrescenta uma linha ao log de curtidas; posts.json não é regravado
+    liked, likes_count = store.likes.toggle(post_id, session['user_id'])
+
     return jsonify({
-        'likes_count': len(post['likes']),
+        'likes_count': likes_count,
         'liked': liked
     })
 
@@ -203,8 +214,8 @@ def delete_post(post_id):
         flash('Login necessário', 'error')
         return redirect(url_for('auth.login'))
     
-    posts = read_json(current_app.config['POSTS_JSON'])
-    post = next((p for p in posts if p['id'] == post_id), None)
+    store = get_store()
+    post = store.posts.get(post_id)
     
     if not post:
         flash('Post não encontrado', 'error')
@@ -228,15 +239,8 @@ def delete_post(post_id):
         except Exception as e:
             print(f"Erro ao deletar imagem: {e}")
             
-    # Remove post
-    posts = [p for p in posts if p['id'] != post_id]
-    write_json(current_app.config['POSTS_JSON'], posts)
-    
-    # Remove comentários órfãos
-    comments = read_json(current_app.config['COMMENTS_JSON'])
-    new_comments = [c for c in comments if c['post_id'] != post_id]
-    if len(comments) != len(new_comments):
-        write_json(current_app.config['COMMENTS_JSON'], new_comments)
+    # Remove post, comentários e curtidas
+    store.delete_post(post_id)
     
     flash('Post excluído com sucesso', 'success')
     return redirect(url_for('main.index'))
@@ -249,8 +253,8 @@ def delete_comment_api(comment_id):
     if not login_required():
         return jsonify({'error': 'Login required'}), 401
         
-    comments = read_json(current_app.config['COMMENTS_JSON'])
-    comment = next((c for c in comments if c['id'] == comment_id), None)
+    store = get_store()
+    comment = store.comments.get(comment_id)
     
     if not comment:
         return jsonify({'error': 'Comment not found'}), 404
@@ -261,38 +265,44 @@ def delete_comment_api(comment_id):
     if not (is_author or is_admin):
         return jsonify({'error': 'Permission denied'}), 403
         
-    comments = [c for c in comments if c['id'] != comment_id]
-    write_json(current_app.config['COMMENTS_JSON'], comments)
+    store.comments.delete(comment_id)
     
     return jsonify({'success': True})
 
 @bp.route('/<post_id>/comments', methods=['GET'])
+@conditional_get('users', 'comments')
 def get_comments(post_id):
     """
     Retorna os comentários de um post em formato JSON.
     """
-    comments = read_json(current_app.config['COMMENTS_JSON'])
-    users = read_json(current_app.config['USERS_JSON'])
-    
-    post_comments = [c for c in comments if c['post_id'] == post_id]
-    
-    current_user_id = session.get('user_id')
-    is_admin = session.get('is_admin', False)
+    store = get_store()
+    post_comments = store.comments.by_post(post_id)
     
-    results = []
-    for c in post_comments:
-        author = next((u for u in users if u['id'] == c['author_id']), None)
-        results.append({
-            'id': c['id'],
-            'post_id': c['post_id'], # Adicionado para o frontend saber qual post atualizar
-            'text': c['text'],
-            'created_at': c['created_at'],
-            'author_nick': author['nickname'] if author else 'Anônimo',
-            'author_image': author['profile_image'].replace('\\', '/') if author and author.get('profile_image') else '',
-            'can_delete': (current_user_id == c['author_id']) or is_admin
-        })
-        
-    return jsonify(results)
+    views = comment_views(store, post_comments, current_user_id=session.get('user_id'),
+                          is_admin=session.get('is_admin', False))
+    # post_id vai junto para o frontend saber qual post atualizar
+    return jsonify([v.to_dict() for v in views])
+
+@bp.route('/activity')
+@conditional_get('users', 'comments', 'likes')
+def posts_activity():
+    """
+    Comentários, contadores e curtidas de vários posts numa só resposta
+    (usado pelo feed em vez de uma requisição por card).
+    Parâmetros:
+    - ids: IDs dos posts separados por vírgula (até ACTIVITY_MAX_POSTS).
+    - limit: comentários por post (padrão 10, máximo 50).
+    - cursor_<post_id>: cursor da próxima página de comentários daquele post.
+    Retorna {post_id: {comments, next_cursor, comments_count, likes_count, liked}}.
+    """
+    post_ids = list(dict.fromkeys(i for i in request.args.get('ids', '').split(',') if i))
+    if len(post_ids) > ACTIVITY_MAX_POSTS:
+        return jsonify({'error': f'At most {ACTIVITY_MAX_POSTS} posts per request'}), 400
+    limit = max(1, min(request.args.get('limit', 10, type=int), 50))
+    cursors = {pid: request.args.get(f'cursor_{pid}') for pid in post_ids}
+    activity = post_activity(get_store(), post_ids, current_user_id=session.get('user_id'),
+                             is_admin=session.get('is_admin', False), limit=limit, cursors=cursors)
+    return jsonify(activity)
 
 @bp.route('/<post_id>/comment', methods=['POST'])
 def add_comment_api(post_id):
@@ -307,11 +317,8 @@ def add_comment_api(post_id):
     if not text:
         return jsonify({'error': 'Empty comment'}), 400
         
-    comments = read_json(current_app.config['COMMENTS_JSON'])
-    posts = read_json(current_app.config['POSTS_JSON'])
-    
-    post_index = next((i for i, p in enumerate(posts) if p['id'] == post_id), None)
-    if post_index is None:
+    store = get_store()
+    if not store.posts.get(post_id):
         return jsonify({'error': 'Post not found'}), 404
         
     new_comment = {
@@ -319,25 +326,12 @@ def add_comment_api(post_id):
         'post_id': post_id,
         'author_id': session['user_id'],
         'text': text,
-        'created_at': datetime.datetime.now(datetime.timezone(datetime.timedelta(hours=-3))).strftime('%H:%M:%S %d/%m/%Y')
+        **now_fields()
     }
-    comments.append(new_comment)
-    write_json(current_app.config['COMMENTS_JSON'], comments)
-    
-    # Atualiza contador no post (opcional, já que calculamos dinamicamente no index, mas bom manter sincronizado)
-    posts[post_index]['comments_count'] = posts[post_index].get('comments_count', 0) + 1
-    write_json(current_app.config['POSTS_JSON'], posts)
-    
-    users = read_json(current_app.config['USERS_JSON'])
-    author = next((u for u in users if u['id'] == session['user_id']), None)
+    store.comments.add(new_comment)
     
-    return jsonify({
-        'id': new_comment['id'],
-        'post_id': post_id,
-        'text': new_comment['text'],
-        'created_at': new_comment['created_at'],
-        'author_nick': author['nickname'] if author else 'Anônimo',
-        'author_image': author['profile_image'].replace('\\', '/') if author and author.get('profile_image') else '',
-        'comments_count': posts[post_index]['comments_count'],
-        'can_delete': True # O próprio autor acabou de criar
-    })
+    # O contador vem do índice de comentários; posts.json não é regravado
+    view = comment_views(store, [new_comment], current_user_id=session['user_id'])[0]
+    result = view.to_dict()
+    result['comments_count'] = store.comments.counts([post_id])[post_id]
+    return jsonify(result)
@@ -0,0 +1,194 @@
+"""
+Índice invertido em memória para a busca de denúncias.
+
+Os textos (descrição, endereço e tags) passam por:
+- dobra de acentos e minúsculas ("Poluição" -> "poluicao");
+- tokenização em palavras, sem stopwords comuns do português;
+- stemming leve: plurais voltam ao singular ("garrafas" -> "garrafa",
+  "poluições" -> "poluicao", "animais" -> "animal").
+
+Cada termo da consulta casa com o termo exato ou, como prefixo, com os
+termos que começam por ele ("polu" -> "poluicao", "poluido"). Todos os
+termos da consulta precisam casar; o resultado é ordenado por relevância
+(peso do campo x raridade do termo), com os mais recentes primeiro no empate.
+
+O índice é atualizado por documento (add/remove), sem reconstruir tudo.
+"""
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+
+from .timestamps import sort_ts
+
+# Peso de cada campo no ranking
+FIELD_WEIGHTS = (('tags', 3.0), ('address', 2.0), ('description', 1.0))
+# Casamento por prefixo vale menos que o termo exato
+PREFIX_FACTOR = 0.5
+MIN_PREFIX_LEN = 2
+
+STOPWORDS = frozenset("""
+a o as os um uma uns umas de da do das dos em na no nas nos num numa ao aos
+e ou que se com sem por para pra pro pelo pela pelos pelas mas como ja nao
+esta este isso isto essa esse aqui ali la muito mais tem ter foi ser sao
+""".split())
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold(text):
+    """Minúsculas e sem acentos."""
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+
+def stem(word):
+    """Stemming leve do português: só reduz plurais ao singular."""
+    if len(word) <= 3:
+        return word
+    if word.endswith(('oes', 'aes')):
+        return word[:-3] + 'ao'
+    if word.endswith('aos'):
+        return word[:-1]
+    if word.endswith('ais'):
+        return word[:-2] + 'l'
+    if word.endswith(('eis', 'ois')):
+        return word[:-2] + 'l'
+    if word.endswith('ns'):
+        return word[:-2] + 'm'
+    if word.endswith(('res', 'zes', 'ses')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Termos indexáveis de um texto (dobrados, sem stopwords, com stemming)."""
+    return [stem(w) for w in _WORD_RE.findall(fold(text))
+            if w not in STOPWORDS and (len(w) > 1 or w.isdigit())]
+
+
+def normalize_tag(tag):
+    """Forma canônica de uma tag: sem '#', acentos e espaços extras, minúscula."""
+    return ' '.join(fold(tag).strip().lstrip('#').split())
+
+
+def parse_tags(raw):
+    """Texto digitado ('Lixo, #praia , lixo') -> lista de tags únicas normalizadas."""
+    tags = (normalize_tag(t) for t in (raw or '').split(','))
+    return list(dict.fromkeys(t for t in tags if t))
+
+
+def post_tags(post):
+    """Tags normalizadas de um post (gravadas em 'tag_list'; posts antigos são lidos de 'tags')."""
+    tag_list = post.get('tag_list')
+    return tag_list if tag_list is not None else parse_tags(post.get('tags'))
+
+
+class SearchIndex:
+    """
+    Índice invertido: termo -> {id do post: peso}.
+    `version` guarda a versão dos dados com que o índice foi montado
+    (quem usa o índice decide quando ele ficou velho).
+    """
+    def __init__(self):
+        self.postings = {}
+        self.doc_terms = {}
+        self.doc_ts = {}
+        self.vocabulary = []  # termos ordenados, para achar prefixos com bisect
+        self.version = None
+
+    def rebuild(self, docs, version):
+        self.postings, self.doc_terms, self.doc_ts = {}, {}, {}
+        for doc in docs:
+            self._index(doc)
+        self.vocabulary = sorted(self.postings)
+        self.version = version
+
+    def _index(self, doc):
+        """Indexa o documento; retorna os termos que ainda não existiam."""
+        doc_id = doc.get('id')
+        if not doc_id:
+            return []
+        weights = {}
+        for field, weight in FIELD_WEIGHTS:
+            for term in tokenize(doc.get(field)):
+                weights[term] = weights.get(term, 0.0) + weight
+        new_terms = []
+        for term, weight in weights.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                new_terms.append(term)
+            postings[doc_id] = weight
+        self.doc_terms[doc_id] = tuple(weights)
+        self.doc_ts[doc_id] = sort_ts(doc)
+        return new_terms
+
+    def add(self, doc):
+        """Indexa (ou reindexa) um post."""
+        self.remove(doc.get('id'))
+        for term in self._index(doc):
+            bisect.insort(self.vocabulary, term)
+
+    def remove(self, doc_id):
+        self.doc_ts.pop(doc_id, None)
+        for term in self.doc_terms.pop(doc_id, ()):
+            postings = self.postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self.postings[term]
+                i = bisect.bisect_left(self.vocabulary, term)
+                if i < len(self.vocabulary) and self.vocabulary[i] == term:
+                    del self.vocabulary[i]
+
+    def _expand(self, token):
+        """Termos do índice que casam com o token: (termo, fator)."""
+        matches = []
+        if token in self.postings:
+            matches.append((token, 1.0))
+        if len(token) >= MIN_PREFIX_LEN:
+            i = bisect.bisect_right(self.vocabulary, token)
+            while i < len(self.vocabulary) and self.vocabulary[i].startswith(token):
+                matches.append((self.vocabulary[i], PREFIX_FACTOR))
+                i += 1
+        return matches
+
+    def scores(self, query):
+        """{id do post: relevância} dos posts que casam com todos os termos da consulta."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return {}
+        total = len(self.doc_terms) or 1
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for term, factor in self._expand(token):
+                postings = self.postings[term]
+                idf = math.log(1.0 + total / len(postings))
+                for doc_id, weight in postings.items():
+                    score = weight * idf * factor
+                    if score > token_scores.get(doc_id, 0.0):
+                        token_scores[doc_id] = score
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {d: s + token_scores[d] for d, s in scores.items() if d in token_scores}
+            if not scores:
+                return {}
+        return scores
+
+    def search(self, query, limit=None, before=None):
+        """
+        Chaves (relevância, created_ts, id) dos resultados, da maior para a menor.
+        `before`: só chaves menores que esta (cursor da página anterior).
+        """
+        keys = ((round(score, 6), self.doc_ts.get(doc_id, 0), doc_id)
+                for doc_id, score in self.scores(query).items())
+        if before is not None:
+            keys = (k for k in keys if k < before)
+        if limit is None:
+            return sorted(keys, reverse=True)
+        return heapq.nlargest(limit, keys)
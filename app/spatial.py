@@ -0,0 +1,196 @@
+"""
+Índice espacial dos pontos de coleta, por worker.
+
+Os pontos com coordenadas ficam numa grade de células de `cell_deg` graus
+(uma grade para todos e uma por tipo de resíduo). Uma consulta só calcula
+a distância (haversine) dos pontos das células vizinhas:
+- por raio: células do retângulo que contém o círculo;
+- k mais próximos: anéis de células em volta do ponto até que nenhuma
+  célula ainda não visitada possa ter algo mais perto que o k-ésimo.
+O índice é montado de novo quando a versão dos pontos de coleta muda
+(`store.data_version('points')`), inclusive por escrita de outro worker.
+"""
+import math
+import threading
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEG = math.pi * EARTH_RADIUS_KM / 180
+
+
+def point_coords(point):
+    """(lat, lon) do ponto, ou None se faltar coordenada ou for inválida (0,0 conta como faltando)."""
+    try:
+        lat, lon = float(point.get('lat')), float(point.get('lon'))
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180) or (lat == 0 and lon == 0):
+        return None
+    return lat, lon
+
+
+class _Grid:
+    """Células (i, j) -> posições dos pontos, mais o retângulo de células ocupadas."""
+    def __init__(self, cell_deg):
+        self.cell_deg = cell_deg
+        self.cells = {}
+        self.size = 0
+        self.bounds = None  # (i_min, i_max, j_min, j_max)
+
+    def cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def add(self, pos, lat, lon):
+        i, j = self.cell(lat, lon)
+        self.cells.setdefault((i, j), []).append(pos)
+        self.size += 1
+        if self.bounds is None:
+            self.bounds = (i, i, j, j)
+        else:
+            i0, i1, j0, j1 = self.bounds
+            self.bounds = (min(i0, i), max(i1, i), min(j0, j), max(j1, j))
+
+
+class PointIndex:
+    """Índice imutável de uma versão dos pontos de coleta."""
+    def __init__(self, points, cell_deg=0.01):
+        self.cell_deg = cell_deg
+        self.points = []
+        # coordenadas em radianos e cosseno da latitude, em listas paralelas
+        # a `points`, para o haversine não recalcular nada do lado do índice
+        self._lat = []
+        self._lon = []
+        self._cos = []
+        self.type_counts = {}
+        self._grids = {None: _Grid(cell_deg)}
+        for p in points:
+            t = p.get('type')
+            self.type_counts[t] = self.type_counts.get(t, 0) + 1
+            coords = point_coords(p)
+            if coords is None:
+                continue
+            pos = len(self.points)
+            self.points.append(p)
+            lat, lon = math.radians(coords[0]), math.radians(coords[1])
+            self._lat.append(lat)
+            self._lon.append(lon)
+            self._cos.append(math.cos(lat))
+            self._grids[None].add(pos, *coords)
+            if t not in self._grids:
+                self._grids[t] = _Grid(cell_deg)
+            self._grids[t].add(pos, *coords)
+
+    @property
+    def cell_count(self):
+        return len(self._grids[None].cells)
+
+    def _distances(self, lat, lon, positions):
+        """[(km, posição)] dos pontos em `positions` até (lat, lon)."""
+        p1, l1 = math.radians(lat), math.radians(lon)
+        c1 = math.cos(p1)
+        lats, lons, coss = self._lat, self._lon, self._cos
+        sin, asin, sqrt = math.sin, math.asin, math.sqrt
+        d = 2 * EARTH_RADIUS_KM
+        return [(d * asin(min(1.0, sqrt(sin((lats[pos] - p1) / 2) ** 2
+                                        + c1 * coss[pos] * sin((lons[pos] - l1) / 2) ** 2))), pos)
+                for pos in positions]
+
+    def _results(self, found):
+        found.sort(key=lambda item: (item[0], item[1]))
+        return [(km, self.points[pos]) for km, pos in found]
+
+    def within(self, lat, lon, radius_km, point_type=None, limit=None):
+        """[(km, ponto)] a até `radius_km` de (lat, lon), do mais perto ao mais longe."""
+        grid = self._grids.get(point_type)
+        if grid is None or not grid.size:
+            return []
+        dlat = radius_km / KM_PER_DEG
+        # longitude encolhe com o cosseno; perto dos polos a faixa vira o globo todo
+        cos_lat = math.cos(math.radians(min(89.9, abs(lat) + dlat)))
+        dlon = min(180.0, radius_km / (KM_PER_DEG * cos_lat))
+        i0, j0 = grid.cell(lat - dlat, lon - dlon)
+        i1, j1 = grid.cell(lat + dlat, lon + dlon)
+        b = grid.bounds
+        i0, i1, j0, j1 = max(i0, b[0]), min(i1, b[1]), max(j0, b[2]), min(j1, b[3])
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(grid.cells):
+            # retângulo maior que a grade ocupada: mais barato varrer as células
+            positions = [pos for (i, j), cell in grid.cells.items()
+                         if i0 <= i <= i1 and j0 <= j <= j1 for pos in cell]
+        else:
+            positions = []
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    positions.extend(grid.cells.get((i, j), ()))
+        found = [item for item in self._distances(lat, lon, positions) if item[0] <= radius_km]
+        results = self._results(found)
+        return results[:limit] if limit else results
+
+    def nearest(self, lat, lon, k, point_type=None, radius_km=None):
+        """Os `k` pontos mais próximos de (lat, lon) ([(km, ponto)]), opcionalmente limitados a um raio."""
+        if radius_km is not None:
+            return self.within(lat, lon, radius_km, point_type, limit=k)
+        grid = self._grids.get(point_type)
+        if grid is None or not grid.size or k <= 0:
+            return []
+        ci, cj = grid.cell(lat, lon)
+        b = grid.bounds
+        max_ring = max(abs(ci - b[0]), abs(ci - b[1]), abs(cj - b[2]), abs(cj - b[3]))
+        found = []
+        seen = 0
+        visited = 0
+        for ring in range(max_ring + 1):
+            visited += 8 * ring or 1
+            if visited > 4 * len(grid.cells):
+                # longe de tudo (anéis quase vazios): mais barato medir todos os pontos
+                positions = [pos for cell in grid.cells.values() for pos in cell]
+                return self._results(self._distances(lat, lon, positions))[:k]
+            positions = []
+            for i in range(ci - ring, ci + ring + 1):
+                if ring and i not in (ci - ring, ci + ring):
+                    # linhas do meio: só as duas pontas pertencem ao anel
+                    cols = (cj - ring, cj + ring)
+                else:
+                    cols = range(cj - ring, cj + ring + 1)
+                for j in cols:
+                    positions.extend(grid.cells.get((i, j), ()))
+            if positions:
+                seen += len(positions)
+                found.extend(self._distances(lat, lon, positions))
+                found.sort(key=lambda item: (item[0], item[1]))
+                del found[k:]
+            if seen >= grid.size:
+                break
+            if len(found) >= k:
+                # células fora do anel estão a pelo menos `ring` células de distância
+                cos_lat = math.cos(math.radians(min(89.9, abs(lat) + (ring + 1) * self.cell_deg)))
+                if found[-1][0] <= ring * self.cell_deg * KM_PER_DEG * cos_lat:
+                    break
+        return self._results(found)
+
+
+class PointIndexCache:
+    """Guarda o PointIndex da versão atual dos pontos; remonta quando a versão muda."""
+    def __init__(self, cell_deg=0.01):
+        self.cell_deg = cell_deg
+        self.builds = 0
+        self.queries = 0
+        self._version = None
+        self._index = None
+        self._lock = threading.Lock()
+
+    def get(self, store):
+        version = store.data_version('points')
+        with self._lock:
+            self.queries += 1
+            if self._index is not None and self._version == version:
+                return self._index
+        index = PointIndex(store.points.all(), self.cell_deg)
+        with self._lock:
+            self._version, self._index = version, index
+            self.builds += 1
+        return index
+
+    def stats(self):
+        index = self._index
+        return {'builds': self.builds, 'queries': self.queries, 'cell_deg': self.cell_deg,
+                'points': len(index.points) if index is not None else None,
+                'cells': index.cell_count if index is not None else None}
@@ -42,3 +42,50 @@ function showBanModal(email) {
 function closeBanModal() {
   document.getElementById("banModal").style.display = "none";
 }
+
+/**
+ * Acompanha uma importação de pontos de coleta em lote.
+ * Abre a aba de pontos de coleta e consulta a rota de status até a
+ * importação terminar.
+ */
+const importProgress = document.getElementById("importProgress");
+if (importProgress) {
+  document.querySelector(".tab-btn[onclick*='collection']")?.click();
+
+  const poll = async () => {
+    let job;
+    try {
+      const res = await fetch(importProgress.dataset.statusUrl);
+      job = await res.json();
+      if (!res.ok) throw new Error(job.error || res.statusText);
+    } catch (err) {
+      importProgress.textContent = `Não foi possível consultar a importação: ${err.message}`;
+      return;
+    }
+
+    const located = job.geocoded + job.not_found + job.unavailable;
+    if (job.status === "done") {
+      importProgress.textContent =
+        `Importação concluída: ${job.added} ponto(s) adicionado(s), ` +
+        `${job.duplicates} repetido(s), ${job.invalid} linha(s) inválida(s), ` +
+        `${job.not_found + job.unavailable} sem localização, ` +
+        `${job.approximate} com localização aproximada. ` +
+        (job.error ? `${job.error}. ` : "");
+      if (job.added > 0) {
+        const link = document.createElement("a");
+        link.href = window.location.pathname;
+        link.textContent = "Atualizar lista";
+        importProgress.appendChild(link);
+      }
+    } else if (job.status === "failed") {
+      importProgress.textContent = `A importação falhou: ${job.error}`;
+    } else {
+      importProgress.textContent =
+        job.to_geocode > 0
+          ? `Geocodificando endereços: ${located}/${job.to_geocode}...`
+          : "Gravando pontos...";
+      setTimeout(poll, 1000);
+    }
+  };
+  poll();
+}
@@ -45,50 +45,55 @@ document.addEventListener("click", (e) => {
 });
 
 /**
- * Função auxiliar para filtrar pontos de coleta
+ * Função auxiliar para filtrar pontos de coleta.
+ * A busca por raio é feita no servidor (/collection-points/nearby, índice
+ * espacial); aqui só distribuímos os pontos retornados entre os cards.
  */
-function filterPoints(lat, lon) {
+async function filterPoints(lat, lon) {
   const radiusInput = document.getElementById("radiusInput");
   const maxDist = parseFloat(radiusInput ? radiusInput.value : 50);
 
-  document.querySelectorAll(".waste-card").forEach((card) => {
+  // Uma consulta por tipo: o limite de resultados do servidor vale por
+  // consulta, então tipos com muitos pontos não escondem os outros.
+  const cards = Array.from(document.querySelectorAll(".waste-card"));
+  const byType = {};
+  try {
+    await Promise.all(
+      cards.map(async (card) => {
+        const type = card.dataset.id;
+        const params = new URLSearchParams({ lat, lon, radius: maxDist, type });
+        const res = await fetch(`/collection-points/nearby?${params}`);
+        const data = await res.json();
+        if (!res.ok) throw new Error(data.error || res.statusText);
+        byType[type] = data.points;
+      })
+    );
+  } catch (err) {
+    console.error("Erro ao buscar pontos próximos:", err);
+    alert("Não foi possível buscar os pontos de coleta próximos.");
+    return;
+  }
+
+  cards.forEach((card) => {
     const details = card.querySelector(".waste-details");
-    const listItems = card.querySelectorAll(".locations li");
-    const locs = [...listItems].map((li) => ({
-      element: li,
-      lat: parseFloat(li.dataset.lat),
-      lon: parseFloat(li.dataset.lon),
-      address: li.textContent.trim(),
-    }));
-
-    if (locs.length === 0) return;
-
-    let countFound = 0;
-
-    locs.forEach((loc) => {
-      // Oculta inicialmente
-      loc.element.style.display = "none";
-
-      if (
-        !isNaN(loc.lat) &&
-        !isNaN(loc.lon) &&
-        loc.lat !== 0 &&
-        loc.lon !== 0
-      ) {
-        const d = distance(lat, lon, loc.lat, loc.lon);
-        // Mostra se estiver dentro do raio
-        if (d <= maxDist) {
-          loc.element.style.display = "block";
-          countFound++;
-        }
-      }
+    const list = card.querySelector(".locations");
+    const found = byType[card.dataset.id] || [];
+
+    list.innerHTML = "";
+    found.forEach((p) => {
+      const li = document.createElement("li");
+      li.dataset.lat = p.lat;
+      li.dataset.lon = p.lon;
+      li.style.display = "block";
+      li.textContent = `${p.address} (${p.distance_km.toFixed(1)} km)`;
+      list.appendChild(li);
     });
 
     const infoDiv = details.querySelector(".nearest-info");
 
-    if (countFound > 0) {
+    if (found.length > 0) {
       if (infoDiv) {
-        infoDiv.textContent = `${countFound} ponto(s) encontrado(s) no raio de ${maxDist} km.`;
+        infoDiv.textContent = `${found.length} ponto(s) encontrado(s) no raio de ${maxDist} km.`;
         infoDiv.style.color = "var(--primary-color)";
       }
 
@@ -204,24 +209,6 @@ document
     }
   });
 
-function distance(lat1, lon1, lat2, lon2) {
-  const R = 6371; // Radius of the earth in km
-  const dLat = deg2rad(lat2 - lat1);
-  const dLon = deg2rad(lon2 - lon1);
-  const a =
-    Math.sin(dLat / 2) * Math.sin(dLat / 2) +
-    Math.cos(deg2rad(lat1)) *
-      Math.cos(deg2rad(lat2)) *
-      Math.sin(dLon / 2) *
-      Math.sin(dLon / 2);
-  const c = 2 * Math.atan2(Math.sqrt(a), Math.sqrt(1 - a));
-  return R * c; // Distance in km
-}
-
-function deg2rad(deg) {
-  return deg * (Math.PI / 180);
-}
-
 // ===== Toggle de visibilidade de senha =====
 const toggleSenha = document.getElementById("toggle-senha");
 if (toggleSenha) {
@@ -400,8 +387,101 @@ function toggleComments(postId) {
   }
 }
 
+// Comentários (primeira página) e próximo cursor de cada post já buscados em /posts/activity
+const postActivity = {};
+// Máximo de posts por chamada (ACTIVITY_MAX_POSTS no backend)
+const ACTIVITY_BATCH = 100;
+const PREFETCH_COMMENTS = 5;
+const MORE_COMMENTS = 20;
+
+/**
+ * Busca comentários, contadores e curtidas de vários posts numa única requisição.
+ * @param {string[]} postIds - IDs dos posts.
+ * @param {object} options - limit (comentários por post) e cursors ({postId: cursor}).
+ */
+function fetchActivity(postIds, options = {}) {
+  const url = new URL("/posts/activity", window.location.origin);
+  url.searchParams.set("ids", postIds.join(","));
+  if (options.limit) url.searchParams.set("limit", options.limit);
+  Object.entries(options.cursors || {}).forEach(([postId, cursor]) => {
+    url.searchParams.set(`cursor_${postId}`, cursor);
+  });
+  return fetch(url).then((res) => res.json());
+}
+
+/**
+ * Atualiza contadores e botão de curtir do card com os dados do lote.
+ */
+function applyActivity(postId, a) {
+  const likes = document.getElementById(`likes-val-${postId}`);
+  if (likes) likes.textContent = a.likes_count;
+  const comments = document.getElementById(`comments-val-${postId}`);
+  if (comments) comments.textContent = a.comments_count;
+  const btn = document.getElementById(`like-btn-${postId}`);
+  if (btn) btn.classList.toggle("liked", a.liked);
+}
+
+/**
+ * Pré-carrega em lote a atividade dos cards ainda não carregados dentro de `root`.
+ * Ao abrir os comentários de um desses cards não é feita nenhuma requisição.
+ */
+function prefetchActivity(root) {
+  const cards = Array.from(root.querySelectorAll(".post-card[data-post-id]")).filter(
+    (card) => !card.dataset.activity
+  );
+  for (let i = 0; i < cards.length; i += ACTIVITY_BATCH) {
+    const batch = cards.slice(i, i + ACTIVITY_BATCH);
+    batch.forEach((card) => (card.dataset.activity = "loading"));
+    const ids = batch.map((card) => card.dataset.postId);
+    fetchActivity(ids, { limit: PREFETCH_COMMENTS })
+      .then((data) => {
+        ids.forEach((postId) => {
+          if (!data[postId]) return;
+          postActivity[postId] = data[postId];
+          applyActivity(postId, data[postId]);
+        });
+        batch.forEach((card) => (card.dataset.activity = "loaded"));
+      })
+      .catch((err) => {
+        console.error("Erro ao carregar atividade dos posts:", err);
+        batch.forEach((card) => delete card.dataset.activity);
+      });
+  }
+}
+
+document.addEventListener("DOMContentLoaded", function () {
+  prefetchActivity(document);
+});
+
 /**
- * Carrega comentários via AJAX.
+ * Mostra os comentários de um post (e o botão "ver mais", se houver mais páginas).
+ * @param {boolean} append - acrescenta à lista em vez de substituí-la.
+ */
+function renderComments(postId, comments, nextCursor, append) {
+  const list = document.getElementById(`comments-list-${postId}`);
+  if (!list) return;
+  if (!append) list.innerHTML = "";
+  const oldMore = list.querySelector(".more-comments");
+  if (oldMore) oldMore.remove();
+
+  if (!append && comments.length === 0) {
+    list.innerHTML = '<p class="no-comments">Seja o primeiro a comentar!</p>';
+  }
+  comments.forEach((c) => list.appendChild(createCommentElement(c)));
+
+  if (nextCursor) {
+    const more = document.createElement("button");
+    more.type = "button";
+    more.className = "more-comments";
+    more.textContent = "Ver mais comentários";
+    more.onclick = () => loadMoreComments(postId, nextCursor);
+    list.appendChild(more);
+  }
+  list.dataset.loaded = "true";
+}
+
+/**
+ * Carrega comentários: usa o que já veio no lote do feed ou busca só este post.
  */
 function loadComments(postId) {
   const list = document.getElementById(`comments-list-${postId}`);
@@ -410,21 +490,19 @@ function loadComments(postId) {
   // Evita recarregar se já carregou (opcional)
   if (list.dataset.loaded === "true") return;
 
+  const cached = postActivity[postId];
+  if (cached) {
+    renderComments(postId, cached.comments, cached.next_cursor, false);
+    return;
+  }
+
   list.innerHTML = '<div class="loading-comments">Carregando...</div>';
 
-  fetch(`/posts/${postId}/comments`)
-    .then((res) => res.json())
+  fetchActivity([postId], { limit: MORE_COMMENTS })
     .then((data) => {
-      list.innerHTML = "";
-      if (data.length === 0) {
-        list.innerHTML =
-          '<p class="no-comments">Seja o primeiro a comentar!</p>';
-      } else {
-        data.forEach((c) => {
-          list.appendChild(createCommentElement(c));
-        });
-      }
-      list.dataset.loaded = "true";
+      const a = data[postId];
+      applyActivity(postId, a);
+      renderComments(postId, a.comments, a.next_cursor, false);
     })
     .catch((err) => {
       console.error(err);
@@ -432,6 +510,18 @@ function loadComments(postId) {
     });
 }
 
+/**
+ * Busca a página seguinte de comentários de um post.
+ */
+function loadMoreComments(postId, cursor) {
+  fetchActivity([postId], { limit: MORE_COMMENTS, cursors: { [postId]: cursor } })
+    .then((data) => {
+      const a = data[postId];
+      renderComments(postId, a.comments, a.next_cursor, true);
+    })
+    .catch((err) => console.error("Erro ao carregar comentários:", err));
+}
+
 /**
  * Cria o elemento HTML de um comentário.
  */
@@ -557,3 +647,58 @@ function checkEnter(event, postId) {
     submitComment(postId);
   }
 }
+
+/**
+ * Rolagem infinita do feed.
+ * Quando o link "Carregar mais" aparece na tela, busca a próxima página em
+ * /posts/feed (cursor em data-next-cursor) e acrescenta os cards ao grid.
+ */
+document.addEventListener("DOMContentLoaded", function () {
+  const grid = document.getElementById("posts-grid");
+  const more = document.getElementById("feed-more");
+  if (!grid || !more || !grid.dataset.feedUrl || !("IntersectionObserver" in window)) return;
+
+  let loading = false;
+
+  function loadNextPage() {
+    const cursor = grid.dataset.nextCursor;
+    if (loading || !cursor) return;
+    loading = true;
+    more.textContent = "Carregando...";
+
+    const url = new URL(grid.dataset.feedUrl, window.location.origin);
+    url.searchParams.set("cursor", cursor);
+
+    fetch(url)
+      .then((res) => res.json())
+      .then((data) => {
+        grid.insertAdjacentHTML("beforeend", data.html);
+        prefetchActivity(grid);
+        grid.dataset.nextCursor = data.next_cursor || "";
+        if (data.next_cursor) {
+          more.textContent = "";
+          // Reobserva para carregar de novo se o link continuar visível
+          observer.unobserve(more);
+          observer.observe(more);
+        } else {
+          observer.disconnect();
+          more.remove();
+        }
+      })
+      .catch((err) => {
+        console.error("Erro ao carregar feed:", err);
+        more.textContent = "Erro ao carregar mais denúncias.";
+      })
+      .finally(() => {
+        loading = false;
+      });
+  }
+
+  const observer = new IntersectionObserver(
+    (entries) => {
+      if (entries.some((e) => e.isIntersecting)) loadNextPage();
+    },
+    { rootMargin: "400px" }
+  );
+  observer.observe(more);
+});
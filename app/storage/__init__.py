@@ -0,0 +1,35 @@
+"""
+Camada de acesso a dados.
+
+O backend é escolhido por `Config.STORAGE_BACKEND`:
+- 'json': arquivos em data/ (users.json, posts.json, ..., banned.csv)
+- 'sqlite': banco SQLite em `Config.SQLITE_PATH`
+
+As curtidas ficam num armazenamento próprio (`likes.LikeStore`), o mesmo
+para os dois backends, disponível em `store.likes`.
+
+As rotas usam sempre `get_store()`.
+"""
+from flask import current_app
+
+from .likes import LikeStore
+
+
+def create_store(config):
+    """Cria o store do backend configurado."""
+    backend = config.get('STORAGE_BACKEND', 'json')
+    if backend == 'json':
+        from .json_backend import JsonStore
+        store = JsonStore(config)
+    elif backend == 'sqlite':
+        from .sqlite_backend import SqliteStore
+        store = SqliteStore(config['SQLITE_PATH'])
+    else:
+        raise ValueError(f"STORAGE_BACKEND desconhecido: {backend!r} (use 'json' ou 'sqlite')")
+    store.likes = LikeStore(config['LIKES_JSON'], config.get('LIKES_FLUSH_SECONDS', 30))
+    return store
+
+
+def get_store():
+    """Retorna o store da aplicação atual."""
+    return current_app.extensions['store']
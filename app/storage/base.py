@@ -0,0 +1,201 @@
+"""
+Interface dos repositórios de dados.
+
+Cada backend (arquivos JSON/CSV ou SQLite) implementa estas classes.
+As rotas só conversam com os repositórios através de `get_store()`,
+nunca diretamente com arquivos ou com o banco.
+
+Convenções:
+- Registros são dicionários; o que é retornado pertence a quem chamou
+  (pode ser alterado sem afetar o armazenamento).
+- `patch(id, func)`: `func` recebe uma cópia do registro e retorna os campos
+  a alterar (ou None). A leitura e a gravação acontecem de forma atômica.
+  Retorna o registro alterado, ou None se o id não existir.
+"""
+
+
+class UserRepository:
+    def all(self):
+        raise NotImplementedError
+
+    def get(self, user_id):
+        raise NotImplementedError
+
+    def get_many(self, user_ids):
+        """Busca vários usuários de uma vez: {id: usuário} (ids inexistentes ficam de fora)."""
+        raise NotImplementedError
+
+    def by_email(self, email):
+        raise NotImplementedError
+
+    def by_nickname(self, nickname):
+        raise NotImplementedError
+
+    def add(self, user):
+        raise NotImplementedError
+
+    def patch(self, user_id, func):
+        raise NotImplementedError
+
+
+class PostRepository:
+    def all(self):
+        raise NotImplementedError
+
+    def get(self, post_id):
+        raise NotImplementedError
+
+    def by_author(self, author_id):
+        raise NotImplementedError
+
+    def recent(self, limit=None, before=None, author_id=None, tag=None):
+        """
+        Posts do mais recente para o mais antigo, pela chave (created_ts, id).
+        `before`: só posts com chave menor que esta (cursor da página anterior).
+        `author_id` / `tag` (normalizada): só posts deste autor / com esta tag.
+        `limit=None` retorna todos.
+        """
+        raise NotImplementedError
+
+    def tag_counts(self, limit=None):
+        """Tags mais usadas nos posts: [(tag, quantidade)], da mais usada para a menos."""
+        raise NotImplementedError
+
+    def search(self, query, limit=None, before=None):
+        """
+        Busca textual (ver `app.search`): lista de (chave, post) da mais
+        relevante para a menos, com chave = (relevância, created_ts, id).
+        `before`: só resultados com chave menor que esta (cursor).
+        """
+        raise NotImplementedError
+
+    def add(self, post):
+        raise NotImplementedError
+
+    def patch(self, post_id, func):
+        raise NotImplementedError
+
+    def delete(self, post_id):
+        raise NotImplementedError
+
+
+class CommentRepository:
+    def all(self):
+        raise NotImplementedError
+
+    def get(self, comment_id):
+        raise NotImplementedError
+
+    def by_post(self, post_id):
+        raise NotImplementedError
+
+    def by_posts(self, post_ids):
+        """Comentários de vários posts de uma vez: {post_id: [comentários]}, em ordem de criação."""
+        raise NotImplementedError
+
+    def counts(self, post_ids):
+        """Quantidade de comentários de cada post informado: {post_id: n}."""
+        raise NotImplementedError
+
+    def add(self, comment):
+        raise NotImplementedError
+
+    def delete(self, comment_id):
+        raise NotImplementedError
+
+    def delete_by_post(self, post_id):
+        raise NotImplementedError
+
+
+class TagRepository:
+    """Tags atribuídas a usuários pelos admins."""
+    def all(self):
+        raise NotImplementedError
+
+    def add(self, tag):
+        raise NotImplementedError
+
+    def remove(self, user_id, tag):
+        raise NotImplementedError
+
+
+class CollectionPointRepository:
+    def all(self):
+        raise NotImplementedError
+
+    def add(self, point):
+        raise NotImplementedError
+
+    def add_many(self, points):
+        """Adiciona vários pontos numa única escrita (importação em lote)."""
+        raise NotImplementedError
+
+    def delete(self, point_id):
+        raise NotImplementedError
+
+
+class BanRepository:
+    """Banimentos por email. Cada item: {'email', 'reason', 'at'}."""
+    def all(self):
+        raise NotImplementedError
+
+    def is_banned(self, email):
+        raise NotImplementedError
+
+    def add(self, email, reason, at):
+        """Retorna False se o email já estava banido."""
+        raise NotImplementedError
+
+    def add_many(self, bans):
+        """Bane vários de uma vez: [(email, reason, at)]. Retorna quantos eram novos."""
+        raise NotImplementedError
+
+    def remove(self, email):
+        raise NotImplementedError
+
+    def remove_many(self, emails):
+        """Desbane vários de uma vez. Retorna quantos foram removidos."""
+        raise NotImplementedError
+
+
+class Store:
+    """Agrupa os repositórios de um backend."""
+    users = None
+    posts = None
+    comments = None
+    tags = None
+    points = None
+    bans = None
+    likes = None  # LikeStore, atribuído por create_store
+
+    def ensure(self):
+        """
+        Cria arquivos/tabelas que ainda não existirem.
+        Chamado uma vez em create_app (não a cada requisição).
+        """
+        raise NotImplementedError
+
+    def delete_post(self, post_id):
+        """
+        Exclui o post junto com seus comentários e curtidas (que ficam fora
+        do registro do post). Usado pelas exclusões do autor e do admin.
+        """
+        self.posts.delete(post_id)
+        self.comments.delete_by_post(post_id)
+        self.likes.clear(post_id)
+
+    def data_version(self, *names):
+        """
+        Versão atual das coleções informadas ('users', 'posts', 'comments',
+        'tags', 'points', 'bans'): um valor comparável que muda sempre que
+        os dados mudam, inclusive por outro processo. Não lê os dados.
+        """
+        raise NotImplementedError
+
+    def verify(self, repair=False):
+        """
+        Confere os dados sob demanda (ex.: depois de restaurar um backup).
+        Retorna a lista de problemas encontrados; com `repair=True` também
+        recria o que estiver faltando (`ensure`).
+        """
+        raise NotImplementedError
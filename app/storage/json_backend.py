@@ -0,0 +1,536 @@
+"""
+Backend em arquivos: JSON para os dados e CSV para os banimentos.
+Usa as funções de `utils_csv` (cache, lock, escrita atômica e journal).
+"""
+import bisect
+import csv
+import heapq
+import io
+import json
+import os
+import threading
+
+from ..utils_csv import (read_json, append_json, update_json, patch_record, delete_records,
+                         ensure_json_file, file_lock, atomic_write, clone_json, data_signature,
+                         file_signature, journal_path)
+from ..timestamps import sort_ts
+from ..search import SearchIndex, post_tags
+from .base import (UserRepository, PostRepository, CommentRepository, TagRepository,
+                   CollectionPointRepository, BanRepository, Store)
+
+
+class _JsonCollection:
+    """Operações comuns a uma lista de registros com campo 'id' em um arquivo JSON."""
+    def __init__(self, path):
+        self.path = path
+
+    def all(self):
+        return read_json(self.path)
+
+    def _find(self, pred):
+        for r in read_json(self.path, copy=False):
+            if pred(r):
+                return clone_json(r)
+        return None
+
+    def _filter(self, pred):
+        return [clone_json(r) for r in read_json(self.path, copy=False) if pred(r)]
+
+    def get(self, record_id):
+        return self._find(lambda r: r.get('id') == record_id)
+
+    def add(self, record):
+        append_json(self.path, record)
+        return record
+
+    def patch(self, record_id, func):
+        return patch_record(self.path, record_id, func)
+
+    def delete(self, record_id):
+        delete_records(self.path, ids=[record_id])
+
+
+class _IndexedCollection(_JsonCollection):
+    """
+    Coleção com índices em memória (`index_class`), válidos enquanto a
+    assinatura dos dados for a mesma com que foram montados; gravações feitas
+    por este processo atualizam os índices sem reconstruí-los.
+    O índice implementa: signature, rebuild(records, signature), get(id),
+    put(record, old=None) e remove(record).
+    """
+    index_class = None
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._index = self.index_class()
+        self._lock = threading.Lock()
+
+    def _fresh_index(self):
+        """Reconstrói os índices se o arquivo mudou (ex.: gravado por outro worker)."""
+        signature = data_signature(self.path)
+        index = self._index
+        if index.signature != signature:
+            with self._lock:
+                if index.signature != signature:
+                    index.rebuild(read_json(self.path, copy=False), signature)
+        return index
+
+    def add(self, record):
+        with file_lock(self.path):
+            index = self._fresh_index()
+            append_json(self.path, record)
+            with self._lock:
+                index.put(clone_json(record))
+                index.signature = data_signature(self.path)
+        return record
+
+    def patch(self, record_id, func):
+        with file_lock(self.path):
+            index = self._fresh_index()
+            old = index.get(record_id)
+            updated = patch_record(self.path, record_id, func)
+            if updated is not None:
+                with self._lock:
+                    index.put(clone_json(updated), old)
+                    index.signature = data_signature(self.path)
+        return updated
+
+    def delete(self, record_id):
+        with file_lock(self.path):
+            index = self._fresh_index()
+            old = index.get(record_id)
+            delete_records(self.path, ids=[record_id])
+            with self._lock:
+                if old is not None:
+                    index.remove(old)
+                index.signature = data_signature(self.path)
+
+
+class _UserIndex:
+    """Índices de users.json: id, email e nickname (minúsculos) -> usuário."""
+    def __init__(self):
+        self.signature = None
+        self.by_id = {}
+        self.by_email = {}
+        self.by_nickname = {}
+
+    def rebuild(self, users, signature):
+        by_id, by_email, by_nickname = {}, {}, {}
+        for u in users:
+            # mantém a primeira ocorrência, como a busca linear fazia
+            by_id.setdefault(u.get('id'), u)
+            by_email.setdefault((u.get('email') or '').lower(), u)
+            by_nickname.setdefault((u.get('nickname') or '').lower(), u)
+        self.by_id, self.by_email, self.by_nickname = by_id, by_email, by_nickname
+        self.signature = signature
+
+    def get(self, user_id):
+        return self.by_id.get(user_id)
+
+    def remove(self, user):
+        if self.by_id.get(user.get('id')) is user:
+            del self.by_id[user.get('id')]
+        for index, key in ((self.by_email, 'email'), (self.by_nickname, 'nickname')):
+            k = (user.get(key) or '').lower()
+            if index.get(k) is not None and index[k].get('id') == user.get('id'):
+                del index[k]
+
+    def put(self, user, old=None):
+        if old is not None:
+            self.remove(old)
+        self.by_id[user.get('id')] = user
+        for index, key in ((self.by_email, 'email'), (self.by_nickname, 'nickname')):
+            k = (user.get(key) or '').lower()
+            if k not in index or index[k].get('id') == user.get('id'):
+                index[k] = user
+
+
+class JsonUserRepository(_IndexedCollection, UserRepository):
+    index_class = _UserIndex
+
+    def _lookup(self, index_name, key):
+        user = getattr(self._fresh_index(), index_name).get(key)
+        return clone_json(user) if user is not None else None
+
+    def get(self, user_id):
+        return self._lookup('by_id', user_id)
+
+    def get_many(self, user_ids):
+        by_id = self._fresh_index().by_id
+        return {uid: clone_json(by_id[uid]) for uid in user_ids if uid in by_id}
+
+    def by_email(self, email):
+        return self._lookup('by_email', (email or '').lower())
+
+    def by_nickname(self, nickname):
+        return self._lookup('by_nickname', (nickname or '').lower())
+
+
+class _RecencyIndex:
+    """
+    Posts em ordem de criação: chaves (created_ts, id) ordenadas, no geral,
+    por autor e por tag. Inserções usam bisect.insort, então ler os N mais
+    recentes é uma fatia da lista, sem ordenar nada a cada requisição.
+    O tamanho de cada lista de tag é a contagem usada nas facetas.
+    """
+    def __init__(self):
+        self.signature = None
+        self.by_id = {}
+        self.keys = []
+        self.by_author = {}
+        self.by_tag = {}
+
+    def rebuild(self, posts, signature):
+        by_id, by_author, by_tag = {}, {}, {}
+        for p in posts:
+            if p.get('id'):
+                by_id.setdefault(p['id'], p)
+        keys = sorted((sort_ts(p), pid) for pid, p in by_id.items())
+        for key in keys:
+            post = by_id[key[1]]
+            by_author.setdefault(post.get('author_id'), []).append(key)
+            for tag in post_tags(post):
+                by_tag.setdefault(tag, []).append(key)
+        self.by_id, self.keys, self.by_author, self.by_tag = by_id, keys, by_author, by_tag
+        self.signature = signature
+
+    def get(self, post_id):
+        return self.by_id.get(post_id)
+
+    def _lists(self, post):
+        yield self.keys
+        yield self.by_author.setdefault(post.get('author_id'), [])
+        for tag in post_tags(post):
+            yield self.by_tag.setdefault(tag, [])
+
+    def remove(self, post):
+        key = (sort_ts(post), post.get('id'))
+        self.by_id.pop(post.get('id'), None)
+        for keys in self._lists(post):
+            i = bisect.bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+        for tag in post_tags(post):
+            if not self.by_tag.get(tag):
+                self.by_tag.pop(tag, None)
+
+    def put(self, post, old=None):
+        if old is not None:
+            self.remove(old)
+        key = (sort_ts(post), post['id'])
+        self.by_id[post['id']] = post
+        for keys in self._lists(post):
+            bisect.insort(keys, key)
+
+    def newest(self, limit=None, before=None, author_id=None, tag=None):
+        if tag is not None:
+            keys = self.by_tag.get(tag, [])
+            if author_id is not None:
+                keys = [k for k in keys if self.by_id[k[1]].get('author_id') == author_id]
+        elif author_id is not None:
+            keys = self.by_author.get(author_id, [])
+        else:
+            keys = self.keys
+        hi = bisect.bisect_left(keys, before) if before is not None else len(keys)
+        lo = 0 if limit is None else max(0, hi - limit)
+        return [self.by_id[pid] for _, pid in reversed(keys[lo:hi])]
+
+
+class _PostIndex(_RecencyIndex):
+    """Índice de recência mais o índice invertido da busca, mantidos juntos."""
+    def __init__(self):
+        super().__init__()
+        self.search = SearchIndex()
+
+    def rebuild(self, posts, signature):
+        super().rebuild(posts, signature)
+        self.search.rebuild(self.by_id.values(), signature)
+
+    def remove(self, post):
+        super().remove(post)
+        self.search.remove(post.get('id'))
+
+    def put(self, post, old=None):
+        super().put(post, old)
+        self.search.add(post)
+
+
+class JsonPostRepository(_IndexedCollection, PostRepository):
+    index_class = _PostIndex
+
+    def get(self, post_id):
+        post = self._fresh_index().get(post_id)
+        return clone_json(post) if post is not None else None
+
+    def by_author(self, author_id):
+        return self._filter(lambda p: p.get('author_id') == author_id)
+
+    def recent(self, limit=None, before=None, author_id=None, tag=None):
+        return [clone_json(p) for p in self._fresh_index().newest(limit, before, author_id, tag)]
+
+    def tag_counts(self, limit=None):
+        by_tag = self._fresh_index().by_tag
+        counts = ((tag, len(keys)) for tag, keys in list(by_tag.items()))
+        if limit is None:
+            return sorted(counts, key=lambda c: (-c[1], c[0]))
+        return heapq.nsmallest(limit, counts, key=lambda c: (-c[1], c[0]))
+
+    def search(self, query, limit=None, before=None):
+        index = self._fresh_index()
+        return [(key, clone_json(index.by_id[key[2]])) for key in index.search.search(query, limit, before)]
+
+
+class _CommentIndex:
+    """
+    Comentários por id e por post (na ordem do arquivo). O tamanho da lista
+    de cada post é o contador de comentários usado no feed.
+    """
+    def __init__(self):
+        self.signature = None
+        self.by_id = {}
+        self.by_post = {}
+
+    def rebuild(self, comments, signature):
+        by_id, by_post = {}, {}
+        for c in comments:
+            if c.get('id') and c['id'] not in by_id:
+                by_id[c['id']] = c
+                by_post.setdefault(c.get('post_id'), []).append(c)
+        self.by_id, self.by_post = by_id, by_post
+        self.signature = signature
+
+    def get(self, comment_id):
+        return self.by_id.get(comment_id)
+
+    def remove(self, comment):
+        self.by_id.pop(comment.get('id'), None)
+        comments = self.by_post.get(comment.get('post_id'))
+        if comments is not None:
+            comments[:] = [c for c in comments if c.get('id') != comment.get('id')]
+            if not comments:
+                del self.by_post[comment.get('post_id')]
+
+    def put(self, comment, old=None):
+        if old is not None:
+            self.remove(old)
+        self.by_id[comment['id']] = comment
+        self.by_post.setdefault(comment.get('post_id'), []).append(comment)
+
+
+class JsonCommentRepository(_IndexedCollection, CommentRepository):
+    index_class = _CommentIndex
+
+    def get(self, comment_id):
+        comment = self._fresh_index().get(comment_id)
+        return clone_json(comment) if comment is not None else None
+
+    def by_post(self, post_id):
+        return [clone_json(c) for c in self._fresh_index().by_post.get(post_id, ())]
+
+    def by_posts(self, post_ids):
+        by_post = self._fresh_index().by_post
+        # mesma ordem do SQLite: (created_ts, id)
+        key = lambda c: (sort_ts(c), c.get('id') or '')
+        return {pid: sorted((clone_json(c) for c in by_post.get(pid, ())), key=key) for pid in post_ids}
+
+    def counts(self, post_ids):
+        by_post = self._fresh_index().by_post
+        return {pid: len(by_post.get(pid, ())) for pid in post_ids}
+
+    def delete_by_post(self, post_id):
+        with file_lock(self.path):
+            index = self._fresh_index()
+            delete_records(self.path, match={'post_id': post_id})
+            with self._lock:
+                for comment in list(index.by_post.get(post_id, ())):
+                    index.remove(comment)
+                index.signature = data_signature(self.path)
+
+
+class JsonTagRepository(TagRepository):
+    def __init__(self, path):
+        self.path = path
+
+    def all(self):
+        return read_json(self.path)
+
+    def add(self, tag):
+        append_json(self.path, tag)
+        return tag
+
+    def remove(self, user_id, tag):
+        update_json(self.path, lambda tags: [t for t in tags if not (t.get('user_id') == user_id and t.get('tag') == tag)])
+
+
+class JsonCollectionPointRepository(_JsonCollection, CollectionPointRepository):
+    def add_many(self, points):
+        points = list(points)
+        if points:
+            update_json(self.path, lambda existing: existing + points)
+    def delete(self, point_id):
+        update_json(self.path, lambda points: [p for p in points if p['id'] != point_id])
+
+
+class CsvBanRepository(BanRepository):
+    """
+    Banimentos em banned.csv (cabeçalho: email,ban_reason,ban_at).
+    O arquivo é lido uma vez por worker para um dicionário email -> banimento
+    e só é relido quando a assinatura dele muda; `is_banned` é O(1).
+    Lido e gravado com o módulo csv (motivos com vírgula ou aspas são escapados).
+    """
+    HEADER = 'email,ban_reason,ban_at\n'
+
+    def __init__(self, path):
+        self.path = path
+        self._bans = {}
+        self._signature = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        bans = {}
+        try:
+            with open(self.path, 'r', newline='', encoding='utf-8') as f:
+                rows = csv.reader(f)
+                next(rows, None)  # Pula cabeçalho
+                for row in rows:
+                    if row and row[0].strip():
+                        email = row[0].strip().lower()
+                        bans.setdefault(email, {
+                            'email': row[0].strip(),
+                            'reason': row[1] if len(row) > 1 else '',
+                            'at': row[2] if len(row) > 2 else ''
+                        })
+        except FileNotFoundError:
+            pass
+        return bans
+
+    def _registry(self):
+        """Banimentos atuais, relendo o arquivo só se ele mudou (ex.: gravado por outro worker)."""
+        signature = file_signature(self.path)
+        if signature != self._signature:
+            with self._lock:
+                if signature != self._signature:
+                    self._bans = self._load()
+                    self._signature = signature
+        return self._bans
+
+    def _commit(self, bans):
+        """Atualiza o registro em memória depois de uma gravação deste processo."""
+        with self._lock:
+            self._bans = bans
+            self._signature = file_signature(self.path)
+
+    @staticmethod
+    def _rows(bans):
+        out = io.StringIO()
+        csv.writer(out, lineterminator='\n').writerows(
+            [b['email'], b.get('reason') or '', b.get('at') or ''] for b in bans)
+        return out.getvalue()
+
+    def all(self):
+        return [dict(b) for b in self._registry().values()]
+
+    def is_banned(self, email):
+        return (email or '').strip().lower() in self._registry()
+
+    def add(self, email, reason, at):
+        return self.add_many([(email, reason, at)]) == 1
+
+    def add_many(self, bans):
+        """Bane vários emails com uma única gravação: [(email, reason, at)]. Retorna quantos eram novos."""
+        with file_lock(self.path):
+            current = dict(self._registry())
+            new = []
+            for email, reason, at in bans:
+                key = (email or '').strip().lower()
+                # Evita duplicar banimento
+                if key and key not in current:
+                    current[key] = {'email': email.strip(), 'reason': reason or '', 'at': at or ''}
+                    new.append(current[key])
+            if not new:
+                return 0
+            if not os.path.exists(self.path):
+                atomic_write(self.path, self.HEADER)
+            with open(self.path, 'a', newline='', encoding='utf-8') as f:
+                f.write(self._rows(new))
+                f.flush()
+                os.fsync(f.fileno())
+            self._commit(current)
+        return len(new)
+
+    def remove(self, email):
+        self.remove_many([email])
+
+    def remove_many(self, emails):
+        """Desbane vários emails regravando o arquivo uma vez. Retorna quantos foram removidos."""
+        keys = {(e or '').strip().lower() for e in emails}
+        with file_lock(self.path):
+            current = self._registry()
+            kept = {k: b for k, b in current.items() if k not in keys}
+            removed = len(current) - len(kept)
+            if removed:
+                atomic_write(self.path, self.HEADER + self._rows(kept.values()))
+                self._commit(kept)
+        return removed
+
+
+class JsonStore(Store):
+    def __init__(self, config):
+        self.config = config
+        self.users = JsonUserRepository(config['USERS_JSON'])
+        self.posts = JsonPostRepository(config['POSTS_JSON'])
+        self.comments = JsonCommentRepository(config['COMMENTS_JSON'])
+        self.tags = JsonTagRepository(config['TAGS_JSON'])
+        self.points = JsonCollectionPointRepository(config['COLLECTION_POINTS_JSON'])
+        self.bans = CsvBanRepository(config['BANNED_CSV'])
+
+    JSON_KEYS = ('USERS_JSON', 'POSTS_JSON', 'COMMENTS_JSON', 'TAGS_JSON', 'COLLECTION_POINTS_JSON')
+    # Nome da coleção -> chave do arquivo na configuração
+    FILES = {'users': 'USERS_JSON', 'posts': 'POSTS_JSON', 'comments': 'COMMENTS_JSON',
+             'tags': 'TAGS_JSON', 'points': 'COLLECTION_POINTS_JSON', 'bans': 'BANNED_CSV'}
+
+    def ensure(self):
+        for key in self.JSON_KEYS:
+            ensure_json_file(self.config[key])
+        banned_csv = self.config['BANNED_CSV']
+        if not os.path.exists(banned_csv):
+            with file_lock(banned_csv):
+                if not os.path.exists(banned_csv):
+                    atomic_write(banned_csv, CsvBanRepository.HEADER)
+
+    def data_version(self, *names):
+        # Assinaturas (stat) dos arquivos: nenhum arquivo é lido
+        return tuple(data_signature(self.config[self.FILES[name]]) for name in names)
+
+    def verify(self, repair=False):
+        problems = []
+        for key in self.JSON_KEYS:
+            path = self.config[key]
+            if not os.path.exists(path):
+                problems.append(f"{path}: não existe")
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if not isinstance(data, list):
+                    problems.append(f"{path}: não é uma lista JSON")
+            except ValueError as e:
+                problems.append(f"{path}: JSON inválido ({e})")
+            journal = journal_path(path)
+            if os.path.exists(journal):
+                with open(journal, 'r', encoding='utf-8') as f:
+                    for n, line in enumerate(f, 1):
+                        try:
+                            json.loads(line)
+                        except ValueError:
+                            problems.append(f"{journal}: linha {n} inválida")
+        banned_csv = self.config['BANNED_CSV']
+        if not os.path.exists(banned_csv):
+            problems.append(f"{banned_csv}: não existe")
+        else:
+            with open(banned_csv, 'r', newline='', encoding='utf-8') as f:
+                if f.readline() != CsvBanRepository.HEADER:
+                    problems.append(f"{banned_csv}: cabeçalho diferente de {CsvBanRepository.HEADER.strip()!r}")
+        if repair:
+            self.ensure()
+        return problems
@@ -0,0 +1,190 @@
+"""
+Curtidas dos posts, fora dos registros de posts.
+
+Cada worker mantém em memória post_id -> conjunto de user_ids, então a
+contagem e o "já curti?" são O(1). Uma curtida não regrava posts.json:
+vira uma linha no log append-only (`likes.log.jsonl`, com fsync) e o estado
+em memória é atualizado na hora, com a contagem exata. De tempos em tempos
+(`flush_seconds`) o log é consolidado no snapshot `likes.json` e zerado.
+
+Outros workers percebem as curtidas novas lendo só o final do log (ou
+recarregando tudo se o snapshot foi regravado), como no journal de utils_csv.
+"""
+import json
+import os
+import threading
+
+from ..utils_csv import file_lock, atomic_write, file_signature, read_log_tail
+
+
+def log_path(path):
+    return os.path.splitext(path)[0] + '.log.jsonl'
+
+
+class LikeStore:
+    def __init__(self, path, flush_seconds=30.0):
+        self.path = path
+        self.log_path = log_path(path)
+        self.flush_seconds = flush_seconds
+        self._likes = {}
+        self._snapshot_sig = None
+        self._log_ino = None
+        self._log_offset = 0
+        self._lock = threading.RLock()
+        self._flush_timer = None
+
+    # --- leitura -------------------------------------------------------
+
+    def _load_snapshot(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        return {post_id: set(users) for post_id, users in data.items()}
+
+    def _apply(self, op):
+        post_id = op.get('post_id')
+        if op.get('clear'):
+            self._likes.pop(post_id, None)
+        elif op.get('liked'):
+            self._likes.setdefault(post_id, set()).add(op.get('user_id'))
+        else:
+            users = self._likes.get(post_id)
+            if users is not None:
+                users.discard(op.get('user_id'))
+
+    def _refresh(self):
+        """
+        Atualiza o estado em memória: relê tudo se o snapshot ou o log foram
+        trocados (flush); senão aplica só as linhas novas do log.
+        """
+        # Caso comum, nada mudou: um stat do log, sem abrir nada. Todo flush
+        # grava um log novo (outro inode), então o snapshot só precisa ser
+        # conferido quando o log ainda não existe.
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            st = None
+        if st is not None:
+            if st.st_ino == self._log_ino and st.st_size == self._log_offset:
+                return
+        elif self._log_ino is None and file_signature(self.path) == self._snapshot_sig:
+            return
+
+        # O log é aberto antes do snapshot: se um flush acontecer no meio,
+        # no máximo reaplicamos operações já incluídas no snapshot.
+        try:
+            log = open(self.log_path, 'rb')
+        except FileNotFoundError:
+            log = None
+        try:
+            st = os.fstat(log.fileno()) if log else None
+            snapshot_sig = file_signature(self.path)
+            log_ino = st.st_ino if st else None
+            if (snapshot_sig != self._snapshot_sig or log_ino != self._log_ino
+                    or (st and st.st_size < self._log_offset)):
+                self._likes = self._load_snapshot()
+                self._snapshot_sig = snapshot_sig
+                self._log_ino = log_ino
+                self._log_offset = 0
+            if log:
+                self._log_offset = read_log_tail(log, self._log_offset, st.st_size, self._apply)
+        finally:
+            if log:
+                log.close()
+
+    def version(self):
+        """Muda a cada curtida ou consolidação (deste ou de outro worker)."""
+        with self._lock:
+            self._refresh()
+            return (self._snapshot_sig, self._log_ino, self._log_offset)
+
+    def count(self, post_id):
+        with self._lock:
+            self._refresh()
+            return len(self._likes.get(post_id, ()))
+
+    def summary(self, post_ids, user_id=None):
+        """{post_id: (quantidade, user_id curtiu?)} para vários posts com uma única verificação do log."""
+        with self._lock:
+            self._refresh()
+            result = {}
+            for post_id in post_ids:
+                users = self._likes.get(post_id, ())
+                result[post_id] = (len(users), bool(user_id) and user_id in users)
+            return result
+
+    # --- escrita -------------------------------------------------------
+
+    def _append(self, op):
+        """Acrescenta uma operação ao log (chamado com o lock do log)."""
+        line = (json.dumps(op, ensure_ascii=False) + '\n').encode('utf-8')
+        with open(self.log_path, 'ab') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self._apply(op)
+        # só este processo escreveu desde o _refresh (o lock do log está conosco)
+        self._log_offset += len(line)
+        if self._log_ino is None:
+            self._log_ino = os.stat(self.log_path).st_ino
+        self._schedule_flush()
+
+    def toggle(self, post_id, user_id):
+        """Curte/descurte. Retorna (curtiu, quantidade atual) já com a alteração."""
+        with self._lock, file_lock(self.log_path):
+            self._refresh()
+            liked = user_id not in self._likes.get(post_id, ())
+            self._append({'post_id': post_id, 'user_id': user_id, 'liked': liked})
+            return liked, len(self._likes.get(post_id, ()))
+
+    def clear(self, post_id):
+        """Remove todas as curtidas de um post (ex.: post excluído)."""
+        with self._lock, file_lock(self.log_path):
+            self._refresh()
+            if post_id in self._likes:
+                self._append({'post_id': post_id, 'clear': True})
+
+    def flush(self):
+        """Consolida o log no snapshot e começa um log novo."""
+        with self._lock, file_lock(self.log_path):
+            self._refresh()
+            if not self._log_offset and os.path.exists(self.path):
+                return
+            data = {post_id: sorted(users) for post_id, users in self._likes.items() if users}
+            atomic_write(self.path, json.dumps(data, ensure_ascii=False))
+            atomic_write(self.log_path, '')
+            self._snapshot_sig = file_signature(self.path)
+            self._log_ino = os.stat(self.log_path).st_ino
+            self._log_offset = 0
+
+    def _schedule_flush(self):
+        if self._flush_timer is not None and self._flush_timer.is_alive():
+            return
+
+        def _run():
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Erro ao consolidar curtidas: {e}")
+
+        self._flush_timer = threading.Timer(self.flush_seconds, _run)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+
+    def ensure(self, posts):
+        """
+        Cria o snapshot na primeira execução, migrando as listas `likes`
+        que ficavam gravadas em cada post, e um log vazio (com o log
+        presente, `_refresh` não precisa conferir o snapshot).
+        """
+        if os.path.exists(self.path) and os.path.exists(self.log_path):
+            return
+        with file_lock(self.log_path):
+            if not os.path.exists(self.path):
+                data = {p['id']: list(dict.fromkeys(p['likes'])) for p in posts.all()
+                        if p.get('id') and p.get('likes')}
+                atomic_write(self.path, json.dumps(data, ensure_ascii=False))
+            if not os.path.exists(self.log_path):
+                atomic_write(self.log_path, '')
@@ -0,0 +1,47 @@
+"""
+Datas de criação de posts e comentários.
+
+`created_at` continua no formato de exibição ('HH:MM:SS DD/MM/YYYY', horário
+de Brasília). Para ordenar, cada registro também guarda `created_ts`: o mesmo
+instante em segundos desde a época (float), que compara corretamente entre dias.
+"""
+import datetime
+
+BRASILIA_TZ = datetime.timezone(datetime.timedelta(hours=-3))
+CREATED_AT_FORMAT = '%H:%M:%S %d/%m/%Y'
+
+
+def now_fields():
+    """Campos de criação para um registro novo: {'created_at', 'created_ts'}."""
+    now = datetime.datetime.now(BRASILIA_TZ)
+    return {
+        'created_at': now.strftime(CREATED_AT_FORMAT),
+        'created_ts': round(now.timestamp(), 3)
+    }
+
+
+def parse_created_at(created_at):
+    """Converte 'HH:MM:SS DD/MM/YYYY' (Brasília) em epoch; None se inválido."""
+    try:
+        dt = datetime.datetime.strptime(created_at or '', CREATED_AT_FORMAT)
+    except ValueError:
+        return None
+    return dt.replace(tzinfo=BRASILIA_TZ).timestamp()
+
+
+def sort_ts(record):
+    """Chave numérica de ordenação; registros sem data válida ficam com 0 (mais antigos)."""
+    ts = record.get('created_ts')
+    if ts is None:
+        ts = parse_created_at(record.get('created_at'))
+    return ts or 0
+
+
+def backfill_created_ts(records):
+    """Preenche `created_ts` nos registros que ainda não têm. Retorna quantos mudaram."""
+    changed = 0
+    for r in records:
+        if 'created_ts' not in r:
+            r['created_ts'] = sort_ts(r)
+            changed += 1
+    return changed
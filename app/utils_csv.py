@@ -1,4 +1,132 @@
-import os, json
+import os, json, threading, tempfile
+from contextlib import contextmanager
+
+from .lru import LRUCache
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ===== Cache de documentos JSON =====
+# Cache LRU (por processo/worker) dos documentos JSON já interpretados.
+# A versão de cada entrada é a "assinatura" do arquivo (inode, tamanho,
+# mtime); se o arquivo mudar em disco (inclusive por outro worker), a
+# entrada deixa de valer e o arquivo é lido novamente.
+_cache = LRUCache(max_entries=16)
+
+def configure_json_cache(max_entries):
+    """Ajusta o tamanho máximo do cache (chamado em create_app)."""
+    _cache.max_entries = max(1, int(max_entries))
+    _cache.invalidate()
+
+def json_cache_stats():
+    return _cache.stats()
+
+def _signature(st):
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+def file_signature(path):
+    """
+    Retorna a assinatura atual do arquivo (inode, tamanho, mtime em ns),
+    ou None se ele não existir.
+    """
+    try:
+        return _signature(os.stat(path))
+    except FileNotFoundError:
+        return None
+
+def data_signature(path):
+    """
+    Assinatura do conteúdo lógico de um arquivo de dados: em arquivos com
+    journal combina snapshot e journal. Muda sempre que os dados mudam.
+    """
+    if path in _journals:
+        return (file_signature(path), file_signature(journal_path(path)))
+    return file_signature(path)
+
+def clone_json(value):
+    """Cópia estrutural de listas/dicionários vindos do JSON (mais barata que deepcopy)."""
+    if isinstance(value, list):
+        return [clone_json(v) if isinstance(v, (list, dict)) else v for v in value]
+    if isinstance(value, dict):
+        d = dict(value)
+        for k, v in d.items():
+            if isinstance(v, (list, dict)):
+                d[k] = clone_json(v)
+        return d
+    return value
+
+# ===== Locks e escrita atômica =====
+_held_locks = threading.local()
+
+@contextmanager
+def file_lock(path):
+    """
+    Lock exclusivo (advisory) entre processos para o arquivo informado.
+    Usa um arquivo auxiliar '<path>.lock' para não interferir na troca
+    atômica do arquivo de dados. É reentrante dentro da mesma thread.
+    """
+    held = getattr(_held_locks, 'paths', None)
+    if held is None:
+        held = _held_locks.paths = set()
+    if path in held:
+        yield
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a+b') as fh:
+        if fcntl:
+            fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+        else:
+            fh.seek(0)
+            msvcrt.locking(fh.fileno(), msvcrt.LK_LOCK, 1)
+        held.add(path)
+        try:
+            yield
+        finally:
+            held.discard(path)
+            if fcntl:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+            else:
+                fh.seek(0)
+                msvcrt.locking(fh.fileno(), msvcrt.LK_UNLCK, 1)
+
+def atomic_write(path, content):
+    """
+    Grava o texto em um arquivo temporário no mesmo diretório, faz fsync e
+    o renomeia por cima do destino. Leitores veem o arquivo antigo ou o novo
+    completo, nunca um arquivo pela metade.
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix='.' + os.path.basename(path) + '.', suffix='.tmp', dir=directory)
+    try:
+        # mkstemp cria com 0600; mantém as permissões do arquivo original
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(tmp_path, mode)
+        with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    if fcntl:
+        # garante que a renomeação também foi persistida
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
 
 # ===== JSON Functions =====
 def ensure_json_file(path):
@@ -7,37 +135,270 @@ def ensure_json_file(path):
     Útil para inicializar arquivos de dados na primeira execução.
     """
     if not os.path.exists(path):
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump([], f, ensure_ascii=False, indent=2)
+        with file_lock(path):
+            if not os.path.exists(path):
+                atomic_write(path, json.dumps([], ensure_ascii=False, indent=2))
 
-def read_json(path):
+def read_json(path, copy=True):
     """
     Lê e retorna o conteúdo de um arquivo JSON.
     Retorna uma lista vazia se o arquivo não existir ou estiver corrompido.
+
+    O documento interpretado fica em cache enquanto o arquivo não mudar.
+    Por padrão devolve uma cópia que pode ser alterada livremente; com
+    copy=False devolve o objeto do cache, que deve ser tratado como somente leitura.
+    Em arquivos com journal, as operações pendentes já vêm aplicadas.
     """
-    if not os.path.exists(path):
+    if path in _journals:
+        data = _read_journaled(path)
+        return clone_json(data) if copy else data
+    sig = file_signature(path)
+    if sig is None:
         return []
+    data = _cache.get(path, sig)
+    if data is None:
+        data, sig = _load_snapshot(path)
+        if sig is None:
+            return []
+        _cache.put(path, data, sig)
+    return clone_json(data) if copy else data
+
+def _load_snapshot(path):
+    """Lê o arquivo JSON do disco. Retorna (dados, assinatura) ou ([], None) em caso de erro."""
     try:
         with open(path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+            sig = _signature(os.fstat(f.fileno()))
+            return json.load(f), sig
     except (json.JSONDecodeError, FileNotFoundError):
-        return []
+        return [], None
+
+def update_json(path, func):
+    """
+    Lê-modifica-escreve um arquivo JSON sob lock exclusivo.
+    `func` recebe a lista atual (cópia alterável) e retorna a lista a ser
+    gravada, ou None para desistir sem gravar nada.
+    Retorna True se o arquivo foi regravado.
+    """
+    with file_lock(path):
+        data = func(read_json(path))
+        if data is None:
+            return False
+        write_json(path, data)
+        return True
 
 def append_json(path, row_dict):
     """
     Adiciona um novo registro (dicionário) ao final de um arquivo JSON existente.
-    Lê o arquivo, adiciona o item e salva novamente.
+    Lê o arquivo, adiciona o item e salva novamente (tudo sob lock).
+    Em arquivos com journal apenas acrescenta uma linha ao journal.
     """
-    data = read_json(path)
-    data.append(row_dict)
-    write_json(path, data)
+    if path in _journals:
+        _journal_append(path, {'op': 'add', 'record': row_dict})
+        return
+    def _append(data):
+        data.append(row_dict)
+        return data
+    update_json(path, _append)
+
+def patch_record(path, record_id, func):
+    """
+    Altera um único registro (identificado pelo campo 'id') sob lock.
+    `func` recebe uma cópia do registro e retorna o dicionário de campos a
+    alterar (ou None para não alterar nada).
+    Retorna o registro já alterado, ou None se o id não existir.
+    """
+    with file_lock(path):
+        current = next((r for r in read_json(path, copy=False) if r.get('id') == record_id), None)
+        if current is None:
+            return None
+        updated = clone_json(current)
+        fields = func(clone_json(current))
+        if not fields:
+            return updated
+        if path in _journals:
+            _journal_append(path, {'op': 'update', 'id': record_id, 'fields': fields})
+        else:
+            def _apply(data):
+                for r in data:
+                    if r.get('id') == record_id:
+                        r.update(fields)
+                return data
+            update_json(path, _apply)
+        updated.update(clone_json(fields))
+        return updated
+
+def _matches(record, ids, match):
+    if record.get('id') in ids:
+        return True
+    return bool(match) and all(record.get(k) == v for k, v in match.items())
+
+def delete_records(path, ids=(), match=None):
+    """
+    Remove registros pelo 'id' e/ou pelos campos em `match`
+    (ex.: match={'post_id': pid} remove os comentários de um post).
+    """
+    ids = set(ids)
+    if path in _journals:
+        _journal_append(path, {'op': 'delete', 'ids': sorted(ids), 'match': match or {}})
+        return
+    def _drop(data):
+        kept = [r for r in data if not _matches(r, ids, match)]
+        return kept if len(kept) != len(data) else None
+    update_json(path, _drop)
 
 def write_json(path, data):
     """
     Sobrescreve o conteúdo de um arquivo JSON com os dados fornecidos.
-    Garante a formatação correta (indentação e caracteres especiais).
+    Garante a formatação correta (indentação e caracteres especiais) e
+    faz a troca do arquivo de forma atômica.
+    Em arquivos com journal, o novo snapshot substitui também o journal.
     """
-    os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    content = json.dumps(data, ensure_ascii=False, indent=2)
+    with file_lock(path):
+        atomic_write(path, content)
+        if path in _journals:
+            try:
+                os.remove(journal_path(path))
+            except FileNotFoundError:
+                pass
+        _cache.invalidate(path)
+
+# ===== Journal (append-only) =====
+# Arquivos com journal: caminho do snapshot -> tamanho máximo do journal (bytes)
+_journals = {}
+_compacting = set()
+_compacting_lock = threading.Lock()
+
+def enable_journal(path, max_bytes):
+    """
+    Liga o modo journal para um arquivo JSON: inclusões, alterações e
+    exclusões passam a ser acrescentadas em '<nome>.journal.jsonl' (uma
+    operação por linha) em vez de regravar o arquivo inteiro. Quando o
+    journal passa de `max_bytes`, é compactado em um novo snapshot.
+    """
+    _journals[path] = max_bytes
+    _cache.invalidate(path)
+
+def journal_path(path):
+    return os.path.splitext(path)[0] + '.journal.jsonl'
+
+def _journal_append(path, op):
+    line = json.dumps(op, ensure_ascii=False) + '\n'
+    with file_lock(path):
+        with open(journal_path(path), 'a', encoding='utf-8', newline='') as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+            size = f.tell()
+    if size >= _journals[path]:
+        _compact_in_background(path)
+
+def _apply_op(records, positions, op):
+    """Aplica uma operação do journal. Operações são idempotentes (reaplicar não muda o resultado)."""
+    kind = op.get('op')
+    if kind == 'add':
+        record = op.get('record') or {}
+        i = positions.get(record.get('id'))
+        if i is None:
+            positions[record.get('id')] = len(records)
+            records.append(record)
+        else:
+            records[i] = record
+    elif kind == 'update':
+        i = positions.get(op.get('id'))
+        if i is not None:
+            # novo dicionário: o anterior pode estar em uso por quem leu com copy=False
+            records[i] = {**records[i], **(op.get('fields') or {})}
+    elif kind == 'delete':
+        ids, match = set(op.get('ids') or ()), op.get('match') or {}
+        kept = [r for r in records if not _matches(r, ids, match)]
+        if len(kept) != len(records):
+            records[:] = kept
+            positions.clear()
+            positions.update((r.get('id'), n) for n, r in enumerate(records))
+
+def read_log_tail(f, offset, size, apply):
+    """
+    Passa para `apply` cada operação JSON do log aberto `f` entre `offset` e
+    `size` (linhas em branco ou inválidas são puladas). Uma última linha
+    incompleta (escrita em andamento) fica para a próxima leitura.
+    Retorna o novo offset.
+    """
+    if size <= offset:
+        return offset
+    f.seek(offset)
+    chunk = f.read(size - offset)
+    end = chunk.rfind(b'\n') + 1
+    for line in chunk[:end].splitlines():
+        if not line.strip():
+            continue
+        try:
+            apply(json.loads(line))
+        except ValueError:
+            continue
+    return offset + end
+
+def _read_journaled(path):
+    """
+    Lê snapshot + journal. Se o snapshot não mudou e o journal apenas
+    cresceu desde a última leitura, aplica só as linhas novas.
+    """
+    jpath = journal_path(path)
+    data = _cache.get(path, data_signature(path))
+    if data is not None:
+        return data
+
+    # O journal é aberto antes do snapshot: se uma compactação acontecer no
+    # meio, no pior caso reaplicamos operações já incluídas (idempotentes).
+    try:
+        jf = open(jpath, 'rb')
+    except FileNotFoundError:
+        jf = None
+    try:
+        j_st = os.fstat(jf.fileno()) if jf else None
+        snap_sig = file_signature(path)
+        prev = _cache.peek(path)
+        if (prev and jf and prev[0][0] == snap_sig and prev[0][1]
+                and prev[0][1][0] == j_st.st_ino and j_st.st_size >= prev[0][1][1]):
+            records, offset = list(prev[1]), prev[0][1][1]
+        else:
+            records, snap_sig = _load_snapshot(path)
+            offset = 0
+
+        j_sig = None
+        if jf:
+            positions = {r.get('id'): n for n, r in enumerate(records)}
+            offset = read_log_tail(jf, offset, j_st.st_size,
+                                   lambda op: _apply_op(records, positions, op))
+            j_sig = (j_st.st_ino, offset, j_st.st_mtime_ns)
+    finally:
+        if jf:
+            jf.close()
+
+    _cache.put(path, records, (snap_sig, j_sig))
+    return records
+
+def compact_journal(path):
+    """Incorpora o journal em um novo snapshot e remove o journal."""
+    with file_lock(path):
+        if not os.path.exists(journal_path(path)):
+            return False
+        write_json(path, read_json(path, copy=False))
+        return True
+
+def _compact_in_background(path):
+    with _compacting_lock:
+        if path in _compacting:
+            return
+        _compacting.add(path)
+
+    def _run():
+        try:
+            compact_journal(path)
+        except Exception as e:
+            print(f"Erro ao compactar journal de {path}: {e}")
+        finally:
+            with _compacting_lock:
+                _compacting.discard(path)
+
+    threading.Thread(target=_run, name='journal-compaction', daemon=True).start()
@@ -0,0 +1,118 @@
+"""
+Catálogo de resíduos da página /waste-info, pré-calculado por worker.
+
+Os tipos de resíduo são fixos (`WASTE_TYPES`); o que depende dos pontos de
+coleta (quantidade por tipo e o GeoJSON dos pontos) é montado uma vez por
+versão do índice espacial (app.spatial), ou seja, só quando os pontos
+mudam. O GeoJSON já fica serializado, com um ETag do hash do conteúdo.
+"""
+import hashlib
+import json
+import threading
+
+# Dados base dos tipos de resíduos
+WASTE_TYPES = (
+    {
+        'id': 'pilhas',
+        'title': 'Pilhas e baterias',
+        'icon': 'fa-battery-full',
+        'color': '#f39c12',
+        'desc': 'Leve até pontos de coleta autorizados. Nunca descarte em lixo comum.'
+    },
+    {
+        'id': 'oleo',
+        'title': 'Óleo de cozinha',
+        'icon': 'fa-bottle-droplet',
+        'color': '#f1c40f',
+        'desc': 'Armazene em garrafa plástica e entregue em pontos de coleta.'
+    },
+    {
+        'id': 'eletronico',
+        'title': 'Lixo Eletrônico',
+        'icon': 'fa-plug',
+        'color': '#7f8c8d',
+        'desc': 'Computadores, celulares e cabos devem ser reciclados separadamente.'
+    },
+    {
+        'id': 'plastico',
+        'title': 'Plástico',
+        'icon': 'fa-bottle-water',
+        'color': '#e74c3c',
+        'desc': 'Lave as embalagens antes de descartar na coleta seletiva.'
+    },
+    {
+        'id': 'vidro',
+        'title': 'Vidro',
+        'icon': 'fa-wine-bottle',
+        'color': '#27ae60',
+        'desc': 'Separe vidros quebrados em caixas de papelão para evitar acidentes.'
+    },
+    {
+        'id': 'papel',
+        'title': 'Papel',
+        'icon': 'fa-newspaper',
+        'color': '#3498db',
+        'desc': 'Papéis secos e limpos podem ser reciclados. Evite amassar.'
+    },
+    {
+        'id': 'metal',
+        'title': 'Metal',
+        'icon': 'fa-gears',
+        'color': '#e67e22',
+        'desc': 'Latas de alumínio e aço são 100% recicláveis.'
+    },
+)
+
+POINT_TYPES = tuple(w['id'] for w in WASTE_TYPES)
+
+
+class WasteCatalog:
+    """
+    Artefatos de uma versão dos pontos:
+    - `wastes`: WASTE_TYPES com 'count' (pontos cadastrados do tipo), para o template;
+    - `geojson`: FeatureCollection compacta (bytes) dos pontos com coordenadas,
+      com os tipos e quantidades no membro 'wastes';
+    - `etag`: hash do `geojson`.
+    """
+    def __init__(self, index):
+        self.wastes = [dict(w, count=index.type_counts.get(w['id'], 0)) for w in WASTE_TYPES]
+        features = [{
+            'type': 'Feature',
+            'id': p.get('id'),
+            'geometry': {'type': 'Point',
+                         'coordinates': [round(float(p['lon']), 6), round(float(p['lat']), 6)]},
+            'properties': {'name': p.get('name'), 'type': p.get('type'), 'address': p.get('address')}
+        } for p in index.points]
+        collection = {
+            'type': 'FeatureCollection',
+            'wastes': [{k: w[k] for k in ('id', 'title', 'icon', 'color', 'count')} for w in self.wastes],
+            'features': features
+        }
+        self.geojson = json.dumps(collection, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = hashlib.sha1(self.geojson).hexdigest()
+
+
+class WasteCatalogCache:
+    """Guarda o WasteCatalog do índice espacial atual; remonta quando o índice é remontado."""
+    def __init__(self, point_index):
+        self.point_index = point_index
+        self.builds = 0
+        self._index = None
+        self._catalog = None
+        self._lock = threading.Lock()
+
+    def get(self, store):
+        index = self.point_index.get(store)
+        with self._lock:
+            if self._index is index:
+                return self._catalog
+        catalog = WasteCatalog(index)
+        with self._lock:
+            self._index, self._catalog = index, catalog
+            self.builds += 1
+        return catalog
+
+    def stats(self):
+        catalog = self._catalog
+        return {'builds': self.builds,
+                'geojson_bytes': len(catalog.geojson) if catalog is not None else None}
@@ -0,0 +1,90 @@
+"""
+Benchmark de escritas concorrentes nos arquivos JSON.
+
+Sobe N processos que fazem, cada um, M operações de ler-modificar-escrever
+(incrementa um contador e acrescenta um registro) no mesmo arquivo, como
+vários workers do gunicorn curtindo/comentando ao mesmo tempo.
+
+    python benchmarks/bench_concurrent_writes.py --procs 4 --writes 200
+    python benchmarks/bench_concurrent_writes.py --mode naive   # sem lock
+
+Ao final mostra escritas por segundo e quantas atualizações foram perdidas.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.utils_csv import read_json, update_json, write_json  # noqa: E402
+
+
+def _locked_worker(path, writes, worker_id):
+    for i in range(writes):
+        def _inc(data):
+            data[0]['count'] += 1
+            data.append({'worker': worker_id, 'seq': i})
+            return data
+        update_json(path, _inc)
+
+
+def _naive_worker(path, writes, worker_id):
+    # Reproduz o padrão antigo: leitura e escrita sem lock, arquivo reescrito no lugar
+    for i in range(writes):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            data = [{'count': 0}]
+        data[0]['count'] += 1
+        data.append({'worker': worker_id, 'seq': i})
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def run(procs, writes, mode):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.json')
+        write_json(path, [{'count': 0}])
+        target = _locked_worker if mode == 'locked' else _naive_worker
+
+        workers = [Process(target=target, args=(path, writes, n)) for n in range(procs)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+
+        data = read_json(path)
+        expected = procs * writes
+        counted = data[0]['count'] if data else 0
+        return {
+            'mode': mode,
+            'procs': procs,
+            'writes': expected,
+            'seconds': round(elapsed, 3),
+            'writes_per_sec': round(expected / elapsed, 1),
+            'lost_updates': expected - counted,
+            'records': max(len(data) - 1, 0),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--procs', type=int, default=4, help='processos escritores simultâneos')
+    parser.add_argument('--writes', type=int, default=200, help='escritas por processo')
+    parser.add_argument('--mode', choices=['locked', 'naive'], default='locked')
+    args = parser.parse_args()
+
+    for n in sorted({1, args.procs}):
+        result = run(n, args.writes, args.mode)
+        print(' '.join(f'{k}={v}' for k, v in result.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark de chamadas ao sistema de arquivos por requisição.
+
+Copia o pacote `app` (com os dados de data/) para uma pasta temporária,
+sobe o app com o test client do Flask e conta, para cada rota, quantas
+chamadas de sistema de arquivos (stat, open, mkdir, replace, fsync...) são
+feitas por requisição, já com os caches aquecidos.
+
+    python benchmarks/bench_request_syscalls.py
+    python benchmarks/bench_request_syscalls.py --requests 200
+    python benchmarks/bench_request_syscalls.py --mode naive   # ensure a cada requisição
+
+O modo `naive` recoloca o padrão antigo: `store.ensure()` antes de toda
+requisição (em check_ban_and_load_user) e de novo nos blueprints auth,
+posts e admin (hooks `ensure_files`), para comparar com o atual, em que os
+arquivos são criados uma vez em create_app.
+
+A contagem é feita no nível do Python (wrappers em `os` e `open`), então
+inclui as chamadas feitas por os.path.exists, os.makedirs, etc.
+"""
+import argparse
+import builtins
+import io
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Funções que resultam em chamadas de sistema de arquivos
+OS_CALLS = ('stat', 'lstat', 'open', 'mkdir', 'replace', 'rename', 'remove', 'unlink',
+            'fsync', 'listdir', 'scandir')
+
+# Blueprints que tinham um hook `ensure_files` próprio
+ENSURE_BLUEPRINTS = ('auth', 'posts', 'admin')
+
+ROUTES = ('/', '/posts/list', '/posts/list?q=lixo', '/posts/feed', '/waste-info', '/auth/login')
+
+
+class SyscallCounter:
+    def __init__(self):
+        self.counts = Counter()
+        self._originals = {}
+
+    def _wrap(self, module, name, label):
+        original = getattr(module, name)
+        self._originals[(module, name)] = original
+        counts = self.counts
+
+        def wrapper(*args, **kwargs):
+            counts[label] += 1
+            return original(*args, **kwargs)
+        setattr(module, name, wrapper)
+
+    def install(self):
+        for name in OS_CALLS:
+            if hasattr(os, name):
+                self._wrap(os, name, f'os.{name}')
+        self._wrap(builtins, 'open', 'open')
+        self._wrap(io, 'open', 'open')
+
+    def uninstall(self):
+        for (module, name), original in self._originals.items():
+            setattr(module, name, original)
+
+
+def install_naive_ensure(app):
+    """Reproduz as chamadas a store.ensure() por requisição, como antes de serem feitas só em create_app."""
+    from flask import request
+    from app.storage import get_store
+
+    @app.before_request
+    def ensure_per_request():
+        store = get_store()
+        store.ensure()
+        if request.blueprint in ENSURE_BLUEPRINTS:
+            store.ensure()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100, help='requisições por rota')
+    parser.add_argument('--mode', choices=('current', 'naive'), default='current',
+                        help='naive: store.ensure() a cada requisição (padrão antigo)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Roda numa cópia para não tocar nos dados reais
+        shutil.copytree(os.path.join(ROOT, 'app'), os.path.join(tmp, 'app'),
+                        ignore=shutil.ignore_patterns('__pycache__', '*.lock', '*.db*'))
+        sys.path.insert(0, tmp)
+        from app import create_app
+
+        app = create_app()
+        if args.mode == 'naive':
+            install_naive_ensure(app)
+        client = app.test_client()
+        # Requisições de um usuário logado (carrega usuário e confere banimento)
+        client.post('/auth/register', data={'email': 'bench@example.com', 'senha': 'x', 'confirmar_senha': 'x',
+                                             'nome': 'Bench', 'nome_usuario': 'bench'})
+        client.post('/auth/login', data={'email': 'bench@example.com', 'password': 'x'})
+        counter = SyscallCounter()
+
+        print(f"modo: {args.mode}")
+        print(f"{'rota':<22} {'syscalls/req':>12}  detalhe")
+        for route in ROUTES:
+            client.get(route)  # aquece caches
+            counter.counts.clear()
+            counter.install()
+            try:
+                for _ in range(args.requests):
+                    client.get(route)
+            finally:
+                counter.uninstall()
+            total = sum(counter.counts.values()) / args.requests
+            detail = ', '.join(f"{k}={v / args.requests:g}" for k, v in counter.counts.most_common())
+            print(f"{route:<22} {total:>12.1f}  {detail}")
+
+
+if __name__ == '__main__':
+    main()